@@ -0,0 +1,119 @@
+"""Benchmark the BufferedReader stdout path against the StreamReader path.
+
+The fake FFmpeg write 1080p sized MJPEG frames as fast as possible. Every
+mode read the same number of frames: readuntil and readexactly on the
+process StreamReader, the MjpegFrameReader on the StreamReader and the
+frame reader on a BufferedReader. Throughput is measured without tracing,
+allocations in a second run with tracemalloc as the peak of newly
+allocated memory between two frames.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+import tracemalloc
+
+import click
+
+from haffmpeg.camera import CameraMjpeg
+
+logging.basicConfig(level=logging.WARNING)
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ffmpeg.py")
+
+RE_CONTENT_LENGTH = re.compile(rb"(?i)content-length:\s*(\d+)")
+
+
+async def frames_bytes(camera):
+    """Yield frames as new bytes objects."""
+    reader = await camera.get_reader()
+    while True:
+        try:
+            header = await reader.readuntil(b"\r\n\r\n")
+            length = int(RE_CONTENT_LENGTH.search(header).group(1))
+            yield await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def frames_view(camera):
+    """Yield frames of the MjpegFrameReader or the BufferedReader."""
+    async for frame in camera.iter_frames():
+        yield frame
+
+
+MODES = {
+    "stream_bytes": (frames_bytes, False),
+    "stream_view": (frames_view, False),
+    "buffered": (frames_view, True),
+}
+
+
+async def run(frames, mode, trace):
+    """Read frames in one mode and return the result."""
+    iterator, buffered = MODES[mode]
+    os.environ["FAKE_FFMPEG_COUNT"] = str(frames + 1)
+    camera = CameraMjpeg(FAKE_FFMPEG)
+    await camera.open_camera("fake", buffered=buffered)
+
+    count = 0
+    size = 0
+    allocated = 0
+    last = 0
+    start = cpu = None
+    try:
+        async for frame in iterator(camera):
+            if start is None:
+                # skip the first frame, it includes FFmpeg startup
+                if trace:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                cpu = time.process_time()
+            else:
+                count += 1
+                size += len(frame)
+                if trace:
+                    allocated += tracemalloc.get_traced_memory()[1] - last
+
+            if trace:
+                tracemalloc.reset_peak()
+                last = tracemalloc.get_traced_memory()[0]
+
+        duration = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        if trace:
+            tracemalloc.stop()
+    finally:
+        await camera.close()
+
+    return {
+        "frames": count,
+        "mib_per_second": size / duration / 1048576,
+        "cpu_per_gib": cpu * 1073741824 / max(size, 1),
+        "allocated_per_frame": allocated / max(count, 1),
+    }
+
+
+@click.command()
+@click.option("--frames", "-n", default=2000, type=int, help="Frames to read")
+@click.option("--frame-size", "-s", default=200000, type=int, help="Frame bytes")
+def cli(frames, frame_size):
+    """Benchmark stdout reading with StreamReader and BufferedReader."""
+    os.environ.update(FAKE_FFMPEG_RATE="0", FAKE_FFMPEG_FRAME_SIZE=str(frame_size))
+
+    async def bench():
+        for mode in MODES:
+            result = await run(frames, mode, trace=False)
+            traced = await run(frames // 10, mode, trace=True)
+            print(
+                f"{mode:>12}: {result['mib_per_second']:8.1f} MiB/s, "
+                f"{result['cpu_per_gib']:6.2f} CPU s/GiB, "
+                f"{traced['allocated_per_frame']:9.0f} bytes allocated/frame"
+            )
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    cli()
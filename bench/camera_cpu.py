@@ -0,0 +1,117 @@
+"""Benchmark CPU usage of MJPEG re-encode against fMP4 passthrough.
+
+Both cameras read the same H.264 recording as fast as possible, the
+output is read until the end of stream. CPU time of FFmpeg is taken
+from the resource usage of terminated child processes and scaled to
+CPU seconds per hour of stream.
+"""
+import asyncio
+import logging
+import os
+import resource
+import tempfile
+import time
+
+import click
+
+from haffmpeg.camera import CameraFmp4, CameraMjpeg
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def children_cpu():
+    """Return CPU seconds of all terminated child processes."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def create_sample(ffmpeg, path, duration):
+    """Encode a 1080p H.264 test stream with a key frame every 2 seconds."""
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg,
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        "testsrc2=size=1920x1080:rate=25",
+        "-t",
+        str(duration),
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-g",
+        "50",
+        "-pix_fmt",
+        "yuv420p",
+        path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    if await proc.wait() != 0:
+        raise click.ClickException("Can't create the sample stream")
+
+
+async def read_mjpeg(ffmpeg, source):
+    """Read all frames of the MJPEG camera."""
+    camera = CameraMjpeg(ffmpeg)
+    await camera.open_camera(source)
+    size = 0
+    async for frame in camera.iter_frames():
+        size += len(frame)
+    await camera.process.wait()
+    await camera.close()
+    return size
+
+
+async def read_fmp4(ffmpeg, source):
+    """Read all fragments of the fMP4 camera."""
+    camera = CameraFmp4(ffmpeg)
+    await camera.open_camera(source)
+    size = 0
+    subscriber = await camera.subscribe()
+    if subscriber is not None:
+        async for segment in subscriber:
+            size += len(segment)
+        await camera.process.wait()
+    await camera.close()
+    return size
+
+
+MODES = {"mjpeg": read_mjpeg, "fmp4": read_fmp4}
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Recording to use instead of a test stream")
+@click.option("--duration", "-d", default=60, type=int, help="Stream seconds")
+def cli(ffmpeg, source, duration):
+    """Benchmark CPU seconds per stream hour of the camera modes."""
+
+    async def bench():
+        with tempfile.TemporaryDirectory() as tmp:
+            input_source = source
+            if input_source is None:
+                input_source = os.path.join(tmp, "sample.mp4")
+                await create_sample(ffmpeg, input_source, duration)
+
+            results = {}
+            for name, read in MODES.items():
+                cpu = children_cpu()
+                start = time.perf_counter()
+                size = await read(ffmpeg, input_source)
+                wall = time.perf_counter() - start
+                results[name] = cpu = children_cpu() - cpu
+                print(
+                    f"{name:>5}: {cpu * 3600 / duration:8.1f} CPU s/stream-hour, "
+                    f"{size / duration / 1024:8.1f} KiB/s, {wall:.1f} s"
+                )
+            if results["mjpeg"]:
+                saved = 1 - results["fmp4"] / results["mjpeg"]
+                print(f"passthrough saves {saved:.1%} CPU")
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,101 @@
+"""Benchmark the frame age of a slow MJPEG consumer.
+
+A camera produce frames with a fixed rate, the consumer need longer for
+every frame. With iter_frames the pipe fill up and FFmpeg fall behind the
+source, with latest_frames the stream is drained and only the newest
+frame is delivered. The age of a frame is the time since the source
+produced it, it is taken from the fake FFmpeg events.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import click
+
+from haffmpeg.camera import CameraMjpeg
+
+logging.basicConfig(level=logging.WARNING)
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ffmpeg.py")
+
+
+async def consume_all(camera, delay):
+    """Read every frame, return the frame numbers and receive times."""
+    received = []
+    async for num, _ in aenumerate(camera.iter_frames()):
+        received.append((num, time.monotonic()))
+        await asyncio.sleep(delay)
+    return received, len(received), 0
+
+
+async def consume_latest(camera, delay):
+    """Read the newest frames, return the frame numbers and receive times."""
+    received = []
+    async with camera.latest_frames() as frames:
+        async for _ in frames:
+            received.append((frames.produced - 1, time.monotonic()))
+            await asyncio.sleep(delay)
+    return received, frames.delivered, frames.dropped
+
+
+async def aenumerate(iterator):
+    """Enumerate a async iterator."""
+    num = 0
+    async for item in iterator:
+        yield num, item
+        num += 1
+
+
+MODES = {"iter_frames": consume_all, "latest_frames": consume_latest}
+
+
+async def run(consume, rate, count, delay, frame_size):
+    """Run one mode and return the frame ages."""
+    with tempfile.TemporaryDirectory() as tmp:
+        events = os.path.join(tmp, "events")
+        os.environ.update(
+            FAKE_FFMPEG_RATE=str(rate),
+            FAKE_FFMPEG_COUNT=str(count),
+            FAKE_FFMPEG_FRAME_SIZE=str(frame_size),
+            FAKE_FFMPEG_EVENTS=events,
+        )
+        camera = CameraMjpeg(FAKE_FFMPEG)
+        await camera.open_camera("fake")
+        received, delivered, dropped = await consume(camera, delay)
+        await camera.close()
+
+        with open(events, encoding="utf-8") as events_file:
+            first = float(events_file.readline())
+
+    # the source produce frame num at this time, a blocked FFmpeg fall behind
+    ages = [stamp - (first + num / rate) for num, stamp in received]
+    return ages, delivered, dropped
+
+
+@click.command()
+@click.option("--rate", "-r", default=25, type=float, help="Source frames per second")
+@click.option("--count", "-c", default=250, type=int, help="Frames of the source")
+@click.option("--delay", "-d", default=0.1, type=float, help="Consumer seconds")
+@click.option("--frame-size", "-s", default=100000, type=int, help="Frame bytes")
+def cli(rate, count, delay, frame_size):
+    """Benchmark frame age of a slow consumer."""
+
+    async def bench():
+        for name, consume in MODES.items():
+            ages, delivered, dropped = await run(
+                consume, rate, count, delay, frame_size
+            )
+            print(
+                f"{name:>13}: median age {statistics.median(ages) * 1000:8.1f} ms, "
+                f"max age {max(ages) * 1000:8.1f} ms, "
+                f"{delivered} delivered, {dropped} dropped"
+            )
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,103 @@
+"""Benchmark the MJPEG frame parser on a 1080p stream.
+
+Compare MjpegFrameReader against reading every frame with readuntil and
+readexactly. Allocations are measured with tracemalloc as the peak of
+newly allocated memory between two frames.
+"""
+import asyncio
+import logging
+import re
+import time
+import tracemalloc
+
+import click
+
+from haffmpeg.camera import CameraMjpeg
+
+logging.basicConfig(level=logging.WARNING)
+
+SOURCE_1080P = "-f lavfi -i testsrc2=size=1920x1080:rate=30"
+
+RE_CONTENT_LENGTH = re.compile(rb"(?i)content-length:\s*(\d+)")
+
+
+async def frames_bytes(stream):
+    """Yield frames as new bytes objects."""
+    reader = await stream.get_reader()
+    while True:
+        try:
+            header = await reader.readuntil(b"\r\n\r\n")
+            length = int(RE_CONTENT_LENGTH.search(header).group(1))
+            yield await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def frames_view(stream):
+    """Yield frames as memoryviews over a reused buffer."""
+    async for frame in stream.iter_frames():
+        yield frame
+
+
+async def run(ffmpeg, source, extra, frames, mode):
+    """Run one benchmark and return the result."""
+    stream = CameraMjpeg(ffmpeg_bin=ffmpeg)
+    await stream.open_camera(source, extra)
+    iterator = frames_view if mode == "view" else frames_bytes
+
+    count = 0
+    size = 0
+    allocated = 0
+    start = None
+    try:
+        async for frame in iterator(stream):
+            current, peak = tracemalloc.get_traced_memory()
+            if start is None:
+                # skip the first frame, it includes FFmpeg startup
+                tracemalloc.start()
+                start = time.perf_counter()
+            else:
+                count += 1
+                size += len(frame)
+                allocated += peak - last
+                if count >= frames:
+                    break
+
+            tracemalloc.reset_peak()
+            last = tracemalloc.get_traced_memory()[0]
+
+        duration = time.perf_counter() - start
+        tracemalloc.stop()
+    finally:
+        await stream.close()
+
+    return {
+        "mode": mode,
+        "frames": count,
+        "fps": count / duration,
+        "frame_size": size // max(count, 1),
+        "allocated_per_frame": allocated / max(count, 1),
+    }
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", default=SOURCE_1080P, help="Input for ffmpeg")
+@click.option("--frames", "-n", default=300, type=int, help="Frames to measure")
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+def cli(ffmpeg, source, frames, extra):
+    """Benchmark MJPEG frame parsing."""
+
+    async def bench():
+        for mode in ("bytes", "view"):
+            result = await run(ffmpeg, source, extra, frames, mode)
+            print(
+                "{mode:>5}: {fps:8.1f} fps, {frame_size} bytes/frame, "
+                "{allocated_per_frame:.0f} bytes allocated/frame".format(**result)
+            )
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Fake FFmpeg binary for benchmarks.
+
+The output is selected from the command line like the library builds it:
+
+- silencedetect filter: silence_start/silence_end lines on stderr
+- framemd5 output: framemd5 lines on stdout
+- metadata print of lavfi.scene_score: frame and score lines on stdout
+- mpjpeg output: multipart JPEG frames on stdout
+- mp4 output: fragmented MP4 init segment and fragments on stdout
+- image2pipe output: one image on stdout and exit
+- -version: version string
+- everything else: wait for q
+
+Settings are read from the environment:
+
+- FAKE_FFMPEG_RATE: events per second, 0 is as fast as possible (10)
+- FAKE_FFMPEG_COUNT: events before exit, 0 runs until q (0)
+- FAKE_FFMPEG_NOISE: not matching stderr lines per event (0)
+- FAKE_FFMPEG_FRAME_SIZE: bytes of a mpjpeg frame (100000)
+- FAKE_FFMPEG_EVENTS: file to write the monotonic time of every event
+
+Like FFmpeg, q on stdin stops the process.
+"""
+import os
+import struct
+import sys
+import threading
+import time
+
+RATE = float(os.environ.get("FAKE_FFMPEG_RATE", "10"))
+COUNT = int(os.environ.get("FAKE_FFMPEG_COUNT", "0"))
+NOISE = int(os.environ.get("FAKE_FFMPEG_NOISE", "0"))
+FRAME_SIZE = int(os.environ.get("FAKE_FFMPEG_FRAME_SIZE", "100000"))
+EVENTS = os.environ.get("FAKE_FFMPEG_EVENTS")
+
+FRAME = b"\xff\xd8" + b"\x00" * max(FRAME_SIZE - 4, 0) + b"\xff\xd9"
+NOISE_LINE = b"[h264 @ 0x55d5c8a0] frame=  100 fps= 25 q=-1.0 size=N/A time=00:00:04.00\n"
+
+stop = threading.Event()
+
+
+def read_stdin():
+    """Stop on q or closed stdin."""
+    # unbuffered, a blocked buffered read abort the interpreter shutdown
+    while True:
+        char = os.read(0, 1)
+        if not char or char == b"q":
+            stop.set()
+            return
+
+
+def silencedetect(num):
+    """Return a silencedetect line pair as event."""
+    if num % 2:
+        return b"[silencedetect @ 0x55d5c8b0] silence_end: %d | silence_duration: 1\n" % num
+    return b"[silencedetect @ 0x55d5c8b0] silence_start: %d\n" % num
+
+
+def framemd5(num):
+    """Return a framemd5 line as event."""
+    return b"0,  %8d,  %8d,        1,  6220800, 2b2b7fa2c8e8f1f3a0a3f42cb0ea3e7c\n" % (
+        num,
+        num,
+    )
+
+
+def scene_score(num):
+    """Return a metadata print of a scene score as event."""
+    score = 0.5 if num % 2 else 0.01
+    return b"frame:%-4d pts:%-7d pts_time:%d\nlavfi.scene_score=%f\n" % (
+        num,
+        num,
+        num,
+        score,
+    )
+
+
+def mpjpeg(num):
+    """Return a multipart JPEG frame as event."""
+    return (
+        b"Content-type: image/jpeg\r\nContent-length: %d\r\n\r\n%s\r\n--ffmpeg\r\n"
+        % (len(FRAME), FRAME)
+    )
+
+
+def box(box_type, body):
+    """Return a MP4 box."""
+    return struct.pack(">I4s", len(body) + 8, box_type) + body
+
+
+FMP4_INIT = box(b"ftyp", b"isom\x00\x00\x02\x00isomiso6") + box(b"moov", bytes(600))
+
+
+def fmp4(num):
+    """Return a fragment as event."""
+    return box(b"moof", struct.pack(">I", num) + bytes(96)) + box(b"mdat", FRAME)
+
+
+def emit(pipe, event, prefix=b""):
+    """Write events with the configured rate."""
+    events = []
+    start = time.monotonic()
+    pipe.write(prefix)
+
+    num = 0
+    while not stop.is_set() and (COUNT == 0 or num < COUNT):
+        if RATE > 0:
+            delay = start + num / RATE - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        data = event(num)
+        if NOISE:
+            data = NOISE_LINE * NOISE + data
+        events.append(time.monotonic())
+        pipe.write(data)
+        pipe.flush()
+        num += 1
+
+    if EVENTS:
+        with open(EVENTS, "w", encoding="utf-8") as events_file:
+            events_file.write("\n".join(map(repr, events)))
+
+
+def main(args):
+    """Run the fake FFmpeg."""
+    threading.Thread(target=read_stdin, daemon=True).start()
+    command = " ".join(args)
+
+    try:
+        if "-version" in args:
+            sys.stdout.write("ffmpeg version 0.0-fake Copyright (c) haffmpeg\n")
+        elif "silencedetect" in command:
+            emit(sys.stderr.buffer, silencedetect)
+        elif "lavfi.scene_score" in command:
+            emit(sys.stdout.buffer, scene_score)
+        elif "framemd5" in args:
+            emit(sys.stdout.buffer, framemd5)
+        elif "mpjpeg" in args:
+            emit(sys.stdout.buffer, mpjpeg, b"--ffmpeg\r\n")
+        elif "mp4" in args:
+            emit(sys.stdout.buffer, fmp4, FMP4_INIT)
+        elif "image2pipe" in args:
+            sys.stdout.buffer.write(FRAME)
+        else:
+            stop.wait()
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,148 @@
+"""Benchmark CPU usage of the motion sensor decode modes.
+
+Every mode processes the same recording as fast as possible. CPU time of
+FFmpeg is taken from the resource usage of terminated child processes
+and scaled to CPU seconds per hour of stream. Selected frames show how
+the sensitivity of a mode compare to the full decode.
+"""
+import asyncio
+import logging
+import os
+import resource
+import tempfile
+import time
+
+import click
+
+from haffmpeg.sensor import (
+    MOTION_DECODE_FULL,
+    MOTION_DECODE_KEYFRAMES,
+    MOTION_DECODE_LOW_CPU,
+    MotionDecode,
+    SensorMotionProtocol,
+)
+
+logging.basicConfig(level=logging.WARNING)
+
+MODES = {
+    "full": MOTION_DECODE_FULL,
+    "fps2": MotionDecode(fps=2),
+    "scale320": MotionDecode(width=320),
+    "gray": MotionDecode(gray=True),
+    "low_cpu": MOTION_DECODE_LOW_CPU,
+    "keyframes": MOTION_DECODE_KEYFRAMES,
+}
+
+
+class CountMotion(SensorMotionProtocol):
+    """Motion sensor they count the selected frames."""
+
+    def __init__(self, ffmpeg_bin):
+        """Init count sensor."""
+        super().__init__(ffmpeg_bin, self._state)
+        self.frames = 0
+        self.done = asyncio.Event()
+
+    def _state(self, state):
+        """Wait for the end of stream."""
+        if state is None:
+            self.done.set()
+
+    def _line_received(self, line):
+        """Count a selected frame."""
+        super()._line_received(line)
+        if self.scene_score is None or self.scene_score > self.changes / 100:
+            self.frames += 1
+
+
+def children_cpu():
+    """Return CPU seconds of all terminated child processes."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def create_sample(ffmpeg, path, duration):
+    """Encode a 1080p H.264 test stream with a key frame every 2 seconds."""
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg,
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        "testsrc2=size=1920x1080:rate=25",
+        "-t",
+        str(duration),
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-g",
+        "50",
+        "-pix_fmt",
+        "yuv420p",
+        path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    if await proc.wait() != 0:
+        raise click.ClickException("Can't create the sample stream")
+
+
+async def run(ffmpeg, source, duration, changes, decode, scene_scores):
+    """Run one mode and return the result."""
+    sensor = CountMotion(ffmpeg)
+    sensor.set_options(changes=changes, decode=decode, scene_scores=scene_scores)
+
+    cpu = children_cpu()
+    start = time.perf_counter()
+    await sensor.open_sensor(input_source=source, extra_cmd=f"-t {duration}")
+    await sensor.done.wait()
+    await sensor.process.wait()
+    wall = time.perf_counter() - start
+    cpu = children_cpu() - cpu
+    await sensor.close()
+
+    return {
+        "cpu_seconds": cpu,
+        "cpu_seconds_per_hour": cpu * 3600 / duration,
+        "streams_per_core": duration / cpu if cpu else 0,
+        "frames": sensor.frames,
+        "wall_seconds": wall,
+    }
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Recording to use instead of a test stream")
+@click.option("--duration", "-d", default=60, type=int, help="Stream seconds")
+@click.option("--changes", "-c", default=10, type=float, help="Scene changes")
+@click.option("--mode", "-m", multiple=True, type=click.Choice(list(MODES)))
+@click.option(
+    "--scene-scores", is_flag=True, help="Print scene scores instead of framemd5"
+)
+def cli(ffmpeg, source, duration, changes, mode, scene_scores):
+    """Benchmark CPU seconds per stream hour of motion decode modes."""
+
+    async def bench():
+        with tempfile.TemporaryDirectory() as tmp:
+            input_source = source
+            if input_source is None:
+                input_source = os.path.join(tmp, "sample.mp4")
+                await create_sample(ffmpeg, input_source, duration)
+
+            for name in mode or MODES:
+                result = await run(
+                    ffmpeg, input_source, duration, changes, MODES[name], scene_scores
+                )
+                print(
+                    f"{name:>9}: {result['cpu_seconds_per_hour']:8.1f} "
+                    "CPU s/stream-hour, "
+                    f"{result['streams_per_core']:6.1f} streams/core, "
+                    f"{result['frames']:6d} frames selected"
+                )
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    cli()
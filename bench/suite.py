@@ -0,0 +1,286 @@
+"""Benchmark the library overhead with a fake FFmpeg.
+
+Measure spawn and close time of HAFFmpeg, lines per second through
+HAFFmpegWorker, latency from an emitted line to the sensor callback and
+memory per sensor instance. Results are written as JSON.
+"""
+import asyncio
+import bisect
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+from haffmpeg.core import HAFFmpeg, HAFFmpegWorker
+from haffmpeg.sensor import (
+    SensorMotion,
+    SensorMotionProtocol,
+    SensorNoise,
+    SensorNoiseProtocol,
+)
+from haffmpeg.state import LoopTimers
+
+logging.basicConfig(level=logging.WARNING)
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ffmpeg.py")
+
+# wait for q without a python interpreter per process
+IDLE_FFMPEG = "#!/bin/sh\nexec head -c 1 > /dev/null\n"
+
+
+def summary(values):
+    """Return statistics of samples in milliseconds."""
+    values = sorted(value * 1000 for value in values)
+    if not values:
+        return {}
+    return {
+        "samples": len(values),
+        "mean_ms": statistics.mean(values),
+        "p50_ms": values[len(values) // 2],
+        "p95_ms": values[int(len(values) * 0.95)],
+        "max_ms": values[-1],
+    }
+
+
+def fake_env(**settings):
+    """Set fake FFmpeg settings for the next spawned processes."""
+    for key in list(os.environ):
+        if key.startswith("FAKE_FFMPEG_"):
+            del os.environ[key]
+    for key, value in settings.items():
+        os.environ[f"FAKE_FFMPEG_{key.upper()}"] = str(value)
+
+
+def rss_bytes():
+    """Return the resident memory of this process."""
+    with open("/proc/self/statm", encoding="utf-8") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def bench_spawn_close(samples):
+    """Measure HAFFmpeg.open and HAFFmpeg.close."""
+    fake_env()
+    spawn = []
+    close = []
+    for _ in range(samples):
+        ffmpeg = HAFFmpeg(FAKE_FFMPEG)
+        start = time.perf_counter()
+        await ffmpeg.open(cmd=[], input_source="fake", output=None, stdout_pipe=False)
+        spawn.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await ffmpeg.close()
+        close.append(time.perf_counter() - start)
+
+    return {"spawn": summary(spawn), "close": summary(close)}
+
+
+class CountWorker(HAFFmpegWorker):
+    """Worker they count the processed lines."""
+
+    def __init__(self, ffmpeg_bin):
+        """Init count worker."""
+        super().__init__(ffmpeg_bin)
+        self.lines = 0
+        self.done = asyncio.Event()
+
+    async def _worker_process(self):
+        """Count lines until the end of output."""
+        while await self._queue.get() is not None:
+            self.lines += 1
+        self.done.set()
+
+
+async def bench_lines(lines, noise):
+    """Measure lines per second through HAFFmpegWorker."""
+    fake_env(rate=0, count=lines, noise=noise)
+    worker = CountWorker(FAKE_FFMPEG)
+
+    start = time.perf_counter()
+    cpu = time.process_time()
+    await worker.start_worker(
+        cmd=["-vn", "-filter:a", "silencedetect=n=-30dB:d=1"],
+        input_source="fake",
+        pattern="silence",
+    )
+    await worker.done.wait()
+    cpu = time.process_time() - cpu
+    duration = time.perf_counter() - start
+    await worker.close()
+
+    total = lines * (noise + 1)
+    return {
+        "lines": total,
+        "matches": worker.lines,
+        "lines_per_second": total / duration,
+        "loop_cpu_seconds": cpu,
+    }
+
+
+async def bench_latency(sensor_cls, events, rate):
+    """Measure time from emitted line to sensor callback."""
+    with tempfile.NamedTemporaryFile(suffix=".events") as events_file:
+        fake_env(rate=rate, count=events, events=events_file.name)
+
+        states = []
+        done = asyncio.Event()
+
+        def callback(state):
+            states.append((state, time.monotonic()))
+            if state is None:
+                done.set()
+
+        # exact timers, every event has to switch the state in time
+        sensor = sensor_cls(
+            FAKE_FFMPEG, callback, LoopTimers(asyncio.get_running_loop())
+        )
+        noise = sensor_cls in (SensorNoise, SensorNoiseProtocol)
+        if noise:
+            sensor.set_options(time_duration=0, time_reset=0)
+        else:
+            sensor.set_options(time_reset=0)
+        await sensor.open_sensor(input_source="fake")
+
+        try:
+            await asyncio.wait_for(done.wait(), events / rate + 10)
+        except asyncio.TimeoutError:
+            pass
+        await sensor.close()
+
+        if noise:
+            # False and True from start, then every line switch the state
+            callbacks = [when for state, when in states[2:] if state is not None]
+        else:
+            # every frame switch motion on
+            callbacks = [when for state, when in states if state is True]
+
+        with open(events_file.name, encoding="utf-8") as emitted:
+            emitted = [float(line) for line in emitted.read().split()]
+
+    latency, merged, unmatched = match_callbacks(emitted, callbacks)
+    result = summary(latency)
+    result["callbacks"] = len(callbacks)
+    result["events"] = len(emitted)
+    result["merged_events"] = merged
+    result["unmatched_callbacks"] = unmatched
+    return result
+
+
+def match_callbacks(emitted, callbacks):
+    """Match every callback with the events emitted before it.
+
+    A callback belongs to the oldest event they has no callback yet, the
+    latency is measured from this event. Events without own callback are
+    merged, callbacks without a new event before them are unmatched.
+    """
+    latency = []
+    merged = unmatched = 0
+    matched = 0
+    for when in callbacks:
+        emitted_before = bisect.bisect_right(emitted, when)
+        if emitted_before <= matched:
+            unmatched += 1
+            continue
+        latency.append(when - emitted[matched])
+        merged += emitted_before - matched - 1
+        matched = emitted_before
+    return latency, merged, unmatched
+
+
+async def bench_memory(count):
+    """Measure memory of running noise sensors."""
+    with tempfile.NamedTemporaryFile("w", suffix=".sh", delete=False) as idle:
+        idle.write(IDLE_FFMPEG)
+    os.chmod(idle.name, 0o755)
+
+    try:
+        gc.collect()
+        tracemalloc.start()
+        python_start = tracemalloc.get_traced_memory()[0]
+        rss_start = rss_bytes()
+
+        sensors = []
+        for _ in range(count):
+            sensor = SensorNoise(idle.name, lambda state: None)
+            await sensor.open_sensor(input_source="fake")
+            sensors.append(sensor)
+        await asyncio.sleep(0.5)
+
+        gc.collect()
+        python_bytes = tracemalloc.get_traced_memory()[0] - python_start
+        rss = rss_bytes() - rss_start
+        tracemalloc.stop()
+
+        await asyncio.gather(*(sensor.close() for sensor in sensors))
+    finally:
+        os.unlink(idle.name)
+
+    return {
+        "instances": count,
+        "python_bytes_per_instance": python_bytes / count,
+        "rss_bytes_per_instance": rss / count,
+    }
+
+
+def raise_open_files(count):
+    """Allow enough pipes for count FFmpeg processes."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    need = count * 4 + 64
+    if soft < need:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(need, hard), hard))
+
+
+@click.command()
+@click.option("--samples", default=50, type=int, help="Spawn and close samples")
+@click.option("--lines", default=200000, type=int, help="Matching lines to read")
+@click.option("--noise", default=9, type=int, help="Not matching lines per match")
+@click.option("--events", default=100, type=int, help="Events for latency")
+@click.option("--rate", default=20, type=float, help="Events per second for latency")
+@click.option(
+    "--instances", default="1,100,1000", help="Comma separated sensor counts"
+)
+@click.option("--output", "-o", default=None, help="JSON output file")
+def cli(samples, lines, noise, events, rate, instances, output):
+    """Benchmark library overhead with a fake FFmpeg."""
+    counts = [int(count) for count in instances.split(",")]
+    raise_open_files(max(counts))
+
+    async def bench():
+        results = {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.time(),
+        }
+        results.update(await bench_spawn_close(samples))
+        results["worker_lines"] = await bench_lines(lines, noise)
+        results["latency"] = {
+            sensor_cls.__name__: await bench_latency(sensor_cls, events, rate)
+            for sensor_cls in (
+                SensorNoise,
+                SensorNoiseProtocol,
+                SensorMotion,
+                SensorMotionProtocol,
+            )
+        }
+        results["memory"] = [await bench_memory(count) for count in counts]
+        return results
+
+    results = json.dumps(asyncio.run(bench()), indent=2)
+    if output is None:
+        print(results)
+    else:
+        with open(output, "w", encoding="utf-8") as output_file:
+            output_file.write(results)
+
+
+if __name__ == "__main__":
+    cli()
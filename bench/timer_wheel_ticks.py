@@ -0,0 +1,72 @@
+"""Check the loop ticks of a shared TimerWheel with busy motion detectors.
+
+Every detector get motion in a fixed interval, this move the deadline of
+its reset timer with every frame and the timer is armed again every time
+it fires. A wheel with one pending loop handle ticks at most once per
+resolution, more ticks per second show stacked tick chains.
+"""
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.state import MotionDetector, TimerWheel
+
+logging.basicConfig(level=logging.WARNING)
+
+
+async def run(detectors, interval, time_reset, duration):
+    """Feed motion and return the ticks of every second."""
+    loop = asyncio.get_running_loop()
+    wheel = TimerWheel.for_loop(loop)
+    ticks = 0
+    on_tick = wheel._on_tick  # pylint: disable=protected-access
+
+    def count_tick():
+        nonlocal ticks
+        ticks += 1
+        on_tick()
+
+    wheel._on_tick = count_tick  # pylint: disable=protected-access
+
+    motions = [
+        MotionDetector(lambda state: None, wheel, time_reset)
+        for _ in range(detectors)
+    ]
+    for motion in motions:
+        motion.start()
+
+    per_second = []
+    end = loop.time() + duration
+    second = loop.time() + 1
+    while loop.time() < end:
+        for motion in motions:
+            motion.motion()
+        await asyncio.sleep(interval)
+        if loop.time() >= second:
+            per_second.append(ticks)
+            ticks = 0
+            second += 1
+
+    for motion in motions:
+        motion.stop()
+    return per_second
+
+
+@click.command()
+@click.option("--detectors", "-n", default=20, type=int, help="Motion detectors")
+@click.option("--interval", "-i", default=0.05, type=float, help="Motion interval")
+@click.option("--time-reset", "-r", default=0.5, type=float, help="Reset seconds")
+@click.option("--duration", "-d", default=5, type=int, help="Seconds to run")
+def cli(detectors, interval, time_reset, duration):
+    """Print the wheel ticks per second and fail on stacked tick chains."""
+    per_second = asyncio.run(run(detectors, interval, time_reset, duration))
+    print("ticks per second:", ", ".join(str(ticks) for ticks in per_second))
+
+    # 20 ticks per second with the default resolution, some slack for jitter
+    if max(per_second) > 25:
+        raise click.ClickException("TimerWheel keeps more than one loop handle")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,101 @@
+"""Benchmark the line reader of HAFFmpegWorker.
+
+A Python child process stands in for FFmpeg and writes verbose stderr
+output with one silencedetect line per 100 lines. The chunked reader is
+compared with the old readline, decode and put per line reader. Event loop
+time is the CPU time of this process while reading.
+"""
+import asyncio
+import logging
+import re
+import sys
+import time
+
+import click
+
+from haffmpeg.core import FFMPEG_STDERR, HAFFmpegWorker
+
+logging.basicConfig(level=logging.WARNING)
+
+EMIT = """
+import sys
+line = b"[h264 @ 0x55d5c8a0] frame=  100 fps= 25 q=-1.0 size=N/A time=00:00:04.00\\n"
+match = b"[silencedetect @ 0x55d5c8b0] silence_end: 4.2 | silence_duration: 1.1\\n"
+block = (line * 99 + match) * 100
+for _ in range({lines} // 10000):
+    sys.stderr.buffer.write(block)
+"""
+
+
+class LineWorker(HAFFmpegWorker):
+    """Worker without processing."""
+
+    async def _worker_process(self):
+        """Not used."""
+
+
+async def process_lines_readline(worker, pattern):
+    """Old reader, readline, decode and put for each line."""
+    cmp = re.compile(pattern)
+    while worker.is_running:
+        line = await worker._input.readline()
+        if not line:
+            break
+        line = line.decode()
+        if cmp.search(line):
+            await worker._queue.put(line)
+    await worker.process.wait()
+    await worker._queue.put(None)
+
+
+async def run(lines, mode):
+    """Run one benchmark and return the result."""
+    worker = LineWorker(ffmpeg_bin=sys.executable)
+    await worker.open(
+        cmd=["-c", EMIT.format(lines=lines)],
+        input_source=None,
+        output="",
+        stdout_pipe=False,
+        stderr_pipe=True,
+    )
+    worker._input = await worker.get_reader(FFMPEG_STDERR)
+
+    start = time.perf_counter()
+    cpu = time.process_time()
+    if mode == "readline":
+        await process_lines_readline(worker, "silence")
+    else:
+        await worker._process_lines("silence")
+    cpu = time.process_time() - cpu
+    duration = time.perf_counter() - start
+
+    matches = worker._queue.qsize() - 1
+    await worker.close()
+    return {
+        "mode": mode,
+        "lines": lines,
+        "matches": matches,
+        "lines_per_second": lines / duration,
+        "loop_us_per_1000_lines": cpu * 1000000000 / lines,
+    }
+
+
+@click.command()
+@click.option("--lines", "-n", default=1000000, type=int, help="Lines to read")
+def cli(lines):
+    """Benchmark HAFFmpegWorker line reading."""
+
+    async def bench():
+        for mode in ("readline", "chunked"):
+            result = await run(lines, mode)
+            print(
+                "{mode:>8}: {lines_per_second:10.0f} lines/s, "
+                "{loop_us_per_1000_lines:8.0f} us loop time/1000 lines, "
+                "{matches} matches".format(**result)
+            )
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,2 +1,17 @@
 """homeassistant ffmpeg shell wrapper."""
-__all__ = ["core", "camera", "sensor", "tools"]
+__all__ = [
+    "analysis",
+    "buffered",
+    "core",
+    "camera",
+    "fmp4",
+    "hub",
+    "pipe",
+    "progress",
+    "recorder",
+    "sensor",
+    "state",
+    "supervisor",
+    "tools",
+    "watchdog",
+]
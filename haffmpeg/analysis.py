@@ -0,0 +1,457 @@
+"""Analyse raw video and audio of FFmpeg with numpy.
+
+numpy is a optional dependency, install ha-ffmpeg[analysis].
+"""
+from dataclasses import dataclass
+from functools import partial
+import logging
+import math
+from typing import Callable, Coroutine, List, Optional, Sequence, Tuple
+
+from .core import FFMPEG_STDOUT, HAFFmpegProtocolWorker
+from .state import MotionDetector, NoiseDetector, TimerService, TimerWheel
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _require_numpy() -> None:
+    """Raise if numpy is not installed."""
+    if np is None:
+        raise ImportError("numpy is required, install ha-ffmpeg[analysis]")
+
+
+class _RawWorker(HAFFmpegProtocolWorker):
+    """Read raw FFmpeg output in fixed size blocks into a reused buffer.
+
+    Data of the pipe is copied into the current block, a full block is
+    passed to _block_received. Nothing is allocated per block.
+    """
+
+    def __init__(self, ffmpeg_bin: str):
+        """Init raw worker."""
+        _require_numpy()
+        super().__init__(ffmpeg_bin)
+
+        self._block: Optional["np.ndarray"] = None
+        self._block_view: Optional[memoryview] = None
+        self._filled = 0
+
+    def _set_block(self, block: "np.ndarray") -> None:
+        """Read the next data into a contiguous uint8 array."""
+        self._block = block
+        self._block_view = memoryview(block.reshape(-1))
+        self._filled = 0
+
+    def _data_received(self, data: bytes) -> None:
+        """Copy data into blocks."""
+        data = memoryview(data)
+        pos = 0
+        while pos < len(data):
+            start = self._filled
+            size = min(len(data) - pos, len(self._block_view) - start)
+            stop = start + size
+            end = pos + size
+            self._block_view[start:stop] = data[pos:end]
+            self._filled = stop
+            pos = end
+
+            if self._filled == len(self._block_view):
+                self._filled = 0
+                self._block_received(self._block)
+
+    def _output_closed(self) -> None:
+        """Drop a incomplete block and signal the end of output."""
+        self._filled = 0
+        _LOGGER.debug("Stopped reading ffmpeg output.")
+        self._worker_stopped()
+
+    def _line_received(self, line: str) -> None:
+        """Raw output has no lines."""
+
+    def _block_received(self, block: "np.ndarray") -> None:
+        """Process a full block."""
+        raise NotImplementedError()
+
+
+@dataclass(frozen=True)
+class MotionZone:
+    """Region of the image with a own motion detection.
+
+    area is x, y, width and height relative to the image size. A boolean
+    mask of the analysis frame size replace the area. changes is the
+    percent of changed pixels in the zone they trigger motion.
+    """
+
+    name: str
+    area: Tuple[float, float, float, float] = (0, 0, 1, 1)
+    mask: Optional["np.ndarray"] = None
+    changes: float = 2
+
+
+def _area_mask(
+    area: Tuple[float, float, float, float], width: int, height: int
+) -> "np.ndarray":
+    """Return a boolean mask of a relative area."""
+    mask = np.zeros((height, width), dtype=bool)
+    pos_x, pos_y, size_x, size_y = area
+    left = int(round(pos_x * width))
+    top = int(round(pos_y * height))
+    right = int(round((pos_x + size_x) * width))
+    bottom = int(round((pos_y + size_y) * height))
+    mask[top:bottom, left:right] = True
+    return mask
+
+
+class SensorMotionZones(_RawWorker):
+    """Implement motion detection per zone on raw gray frames.
+
+    FFmpeg scale the video to small gray frames, the difference to the
+    previous frame is compared per pixel and counted per zone. Ignore
+    areas (like trees or a road) don't count in any zone. Callback is
+    called with the zone name and the state.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Callable[[str, Optional[bool]], None],
+        timers: Optional[TimerService] = None,
+    ):
+        """Init motion zones sensor."""
+        super().__init__(ffmpeg_bin)
+
+        self._callback = callback
+        self._timers = timers or TimerWheel.for_loop(self._loop)
+        self._zones: List[MotionZone] = [MotionZone("all")]
+        self._ignore: Sequence = ()
+        self._width = 160
+        self._height = 90
+        self._fps = 5
+        self._pixel_changes = 25
+        self._time_reset = 60
+        self._time_repeat = 0
+        self._repeat = 0
+        self._detectors: List[MotionDetector] = []
+        self._first = True
+
+        # analysis buffers, allocated on open
+        self._frames: List["np.ndarray"] = []
+        self._diff: Optional["np.ndarray"] = None
+        self._changed: Optional["np.ndarray"] = None
+        self._zone_matrix: Optional["np.ndarray"] = None
+        self._zone_pixels: Optional["np.ndarray"] = None
+        self._thresholds: Optional["np.ndarray"] = None
+        self._counts: Optional["np.ndarray"] = None
+        self._ratios: Optional["np.ndarray"] = None
+
+    @property
+    def ratios(self) -> Optional["np.ndarray"]:
+        """Return the percent of changed pixels per zone of the last frame."""
+        return self._ratios
+
+    def set_options(
+        self,
+        zones: Optional[Sequence[MotionZone]] = None,
+        ignore: Sequence = (),
+        time_reset: int = 60,
+        time_repeat: int = 0,
+        repeat: int = 0,
+        width: int = 160,
+        height: int = 90,
+        fps: float = 5,
+        pixel_changes: int = 25,
+    ) -> None:
+        """Set option parameter for motion zones sensor.
+
+        ignore is a list of areas or boolean masks. pixel_changes is the
+        gray level difference of a changed pixel.
+        """
+        self._zones = list(zones) if zones else [MotionZone("all")]
+        self._ignore = ignore
+        self._time_reset = time_reset
+        self._time_repeat = time_repeat
+        self._repeat = repeat
+        self._width = width
+        self._height = height
+        self._fps = fps
+        self._pixel_changes = pixel_changes
+
+    def open_sensor(
+        self, input_source: str, extra_cmd: Optional[str] = None
+    ) -> Coroutine:
+        """Open FFmpeg process a video stream for motion detection.
+
+        Return a coroutine.
+        """
+        self._setup_frames()
+        video_filter = (
+            f"fps={self._fps},"
+            f"scale={self._width}:{self._height}:flags=fast_bilinear,"
+            "format=gray"
+        )
+        return self.start_worker(
+            cmd=["-an", "-filter:v", video_filter],
+            input_source=input_source,
+            output="-f rawvideo -pix_fmt gray -",
+            extra_cmd=extra_cmd,
+            reading=FFMPEG_STDOUT,
+        )
+
+    def _setup_frames(self) -> None:
+        """Allocate all buffers of the analysis."""
+        shape = (self._height, self._width)
+        self._frames = [np.zeros(shape, dtype=np.uint8) for _ in range(2)]
+        self._diff = np.zeros(shape, dtype=np.int16)
+        self._changed = np.zeros(shape[0] * shape[1], dtype=np.float32)
+        self._first = True
+
+        # zone weights without ignored areas as matrix, zones x pixels
+        ignore = np.zeros(shape, dtype=bool)
+        for area in self._ignore:
+            if isinstance(area, np.ndarray):
+                ignore |= area.astype(bool)
+            else:
+                ignore |= _area_mask(area, self._width, self._height)
+
+        masks = []
+        for zone in self._zones:
+            if zone.mask is not None:
+                mask = zone.mask.astype(bool)
+            else:
+                mask = _area_mask(zone.area, self._width, self._height)
+            masks.append((mask & ~ignore).reshape(-1))
+        self._zone_matrix = np.array(masks, dtype=np.float32)
+        self._zone_pixels = np.maximum(self._zone_matrix.sum(axis=1), 1)
+        self._thresholds = np.array(
+            [zone.changes for zone in self._zones], dtype=np.float32
+        )
+        self._counts = np.zeros(len(self._zones), dtype=np.float32)
+        self._ratios = np.zeros(len(self._zones), dtype=np.float32)
+
+        self._set_block(self._frames[0])
+
+    def _worker_started(self) -> None:
+        """Start motion detection of all zones."""
+        self._detectors = []
+        for zone in self._zones:
+            detector = MotionDetector(
+                partial(self._loop.call_soon, self._callback, zone.name),
+                self._timers,
+                self._time_reset,
+                self._time_repeat,
+                self._repeat,
+            )
+            detector.start()
+            self._detectors.append(detector)
+
+    def _worker_stopped(self) -> None:
+        """Stop motion detection of all zones."""
+        for detector in self._detectors:
+            detector.stop()
+
+    def _block_received(self, block: "np.ndarray") -> None:
+        """Compare a frame with the previous frame."""
+        current, previous = self._frames
+        # read the next frame into the buffer of the previous frame
+        self._frames = [previous, current]
+        self._set_block(previous)
+
+        if self._first:
+            self._first = False
+            return
+
+        np.subtract(current, previous, out=self._diff, dtype=np.int16)
+        np.abs(self._diff, out=self._diff)
+        np.greater(
+            self._diff.reshape(-1), self._pixel_changes, out=self._changed
+        )
+        np.dot(self._zone_matrix, self._changed, out=self._counts)
+        np.divide(self._counts, self._zone_pixels, out=self._ratios)
+        self._ratios *= 100
+
+        for index in np.flatnonzero(self._ratios > self._thresholds):
+            self._detectors[index].motion()
+
+
+@dataclass(frozen=True)
+class NoiseThreshold:
+    """Noise detection on the level of a audio level meter.
+
+    Like silencedetect the sample peak of a window is compared with peak
+    dBFS and silence start after silence_duration seconds below. Noise is
+    reported if there is no silence for time_duration seconds and ends
+    after time_reset seconds of silence.
+    """
+
+    name: str
+    peak: float = -30
+    time_duration: float = 1
+    time_reset: float = 2
+    silence_duration: float = 1
+
+
+class SensorAudioLevel(_RawWorker):
+    """Implement a audio level meter with noise thresholds.
+
+    FFmpeg decode the audio to mono PCM with a low sample rate, RMS and
+    peak level in dBFS are calculated per window. Windows are processed
+    in batches, all thresholds use the same FFmpeg process. Level
+    callback is called with the RMS and peak level of every window,
+    callback with the threshold name and the noise state.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Callable[[str, Optional[bool]], None],
+        level_callback: Optional[Callable[[float, float], None]] = None,
+        timers: Optional[TimerService] = None,
+    ):
+        """Init audio level sensor."""
+        super().__init__(ffmpeg_bin)
+
+        self._callback = callback
+        self._level_callback = level_callback
+        self._timers = timers or TimerWheel.for_loop(self._loop)
+        self._thresholds: List[NoiseThreshold] = [NoiseThreshold("noise")]
+        self._sample_rate = 8000
+        self._window = 0.1
+        self._batch = 5
+        self._detectors: List[NoiseDetector] = []
+        self._level: Tuple[float, float] = (-np.inf, -np.inf)
+
+        # analysis buffers, allocated on open
+        self._samples: Optional["np.ndarray"] = None
+        self._values: Optional["np.ndarray"] = None
+        self._rms: Optional["np.ndarray"] = None
+        self._peak: Optional["np.ndarray"] = None
+        self._peaks: Optional["np.ndarray"] = None
+        self._above: Optional["np.ndarray"] = None
+        self._quiet: List[int] = []
+        self._silent: List[bool] = []
+        self._silence_windows: List[int] = []
+
+    @property
+    def level(self) -> Tuple[float, float]:
+        """Return RMS and peak level in dBFS of the last window."""
+        return self._level
+
+    def set_options(
+        self,
+        thresholds: Optional[Sequence[NoiseThreshold]] = None,
+        sample_rate: int = 8000,
+        window: float = 0.1,
+        batch: int = 5,
+    ) -> None:
+        """Set option parameter for audio level sensor.
+
+        window is the length of a level in seconds, batch the count of
+        windows they are processed together.
+        """
+        self._thresholds = (
+            list(thresholds) if thresholds else [NoiseThreshold("noise")]
+        )
+        self._sample_rate = sample_rate
+        self._window = window
+        self._batch = batch
+
+    def open_sensor(
+        self, input_source: str, extra_cmd: Optional[str] = None
+    ) -> Coroutine:
+        """Open FFmpeg process for read autio stream.
+
+        Return a coroutine.
+        """
+        self._setup_levels()
+        return self.start_worker(
+            cmd=["-vn"],
+            input_source=input_source,
+            output=f"-ac 1 -ar {self._sample_rate} -f s16le -",
+            extra_cmd=extra_cmd,
+            reading=FFMPEG_STDOUT,
+        )
+
+    def _setup_levels(self) -> None:
+        """Allocate all buffers of the analysis."""
+        window = max(int(self._sample_rate * self._window), 1)
+        shape = (self._batch, window)
+        self._samples = np.zeros(shape, dtype="<i2")
+        self._values = np.zeros(shape, dtype=np.float32)
+        self._rms = np.zeros(self._batch, dtype=np.float32)
+        self._peak = np.zeros(self._batch, dtype=np.float32)
+        self._peaks = np.array(
+            [threshold.peak for threshold in self._thresholds], dtype=np.float32
+        )
+        self._above = np.zeros((self._batch, len(self._thresholds)), dtype=bool)
+        # detectors start in detect state, like noise on start
+        self._quiet = [0] * len(self._thresholds)
+        self._silent = [False] * len(self._thresholds)
+        self._silence_windows = [
+            max(math.ceil(threshold.silence_duration / self._window), 1)
+            for threshold in self._thresholds
+        ]
+
+        self._set_block(self._samples.view(np.uint8))
+
+    def _worker_started(self) -> None:
+        """Start noise detection of all thresholds."""
+        self._detectors = []
+        for threshold in self._thresholds:
+            detector = NoiseDetector(
+                partial(self._loop.call_soon, self._callback, threshold.name),
+                self._timers,
+                threshold.time_duration,
+                threshold.time_reset,
+            )
+            detector.start()
+            self._detectors.append(detector)
+
+    def _worker_stopped(self) -> None:
+        """Stop noise detection of all thresholds."""
+        for detector in self._detectors:
+            detector.stop()
+
+    def _block_received(self, block: "np.ndarray") -> None:
+        """Calculate the levels of a batch of windows."""
+        values = self._values
+        np.multiply(self._samples, 1 / 32768, out=values)
+
+        # RMS and peak in dBFS, silence is limited to -200 dBFS
+        np.square(values, out=values)
+        np.mean(values, axis=1, out=self._rms)
+        np.sqrt(self._rms, out=self._rms)
+        np.abs(self._samples, out=values, dtype=np.float32)
+        np.max(values, axis=1, out=self._peak)
+        self._peak *= 1 / 32768
+        for level in (self._rms, self._peak):
+            np.maximum(level, 1e-10, out=level)
+            np.log10(level, out=level)
+            level *= 20
+
+        self._level = (float(self._rms[-1]), float(self._peak[-1]))
+        if self._level_callback is not None:
+            for rms, peak in zip(self._rms.tolist(), self._peak.tolist()):
+                self._loop.call_soon(self._level_callback, rms, peak)
+
+        # compare the sample peak like silencedetect, silence start after
+        # silence_duration below and end with the first window above
+        np.greater.outer(self._peak, self._peaks, out=self._above)
+        for index, detector in enumerate(self._detectors):
+            quiet = self._quiet[index]
+            for above in self._above[:, index].tolist():
+                if above:
+                    quiet = 0
+                    if self._silent[index]:
+                        self._silent[index] = False
+                        detector.silence_end()
+                    continue
+                quiet += 1
+                if not self._silent[index] and quiet >= self._silence_windows[index]:
+                    self._silent[index] = True
+                    detector.silence_start()
+            self._quiet[index] = quiet
@@ -0,0 +1,152 @@
+"""Read FFmpeg output into a preallocated buffer."""
+import asyncio
+import logging
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BufferedReader(asyncio.BufferedProtocol):
+    """Receive FFmpeg output directly into a preallocated buffer.
+
+    Data is returned as memoryview into the buffer, a view is only valid
+    until the next read. Use bytes() to keep data. Reading is paused if
+    the buffer is full, the buffer grow only for a single read they need
+    more space.
+    """
+
+    def __init__(self, buffer_size: int = 1048576):
+        """Init buffered reader."""
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._eof = False
+        self._paused = False
+        self._transport: Optional[asyncio.Transport] = None
+        self._waiter: Optional[asyncio.Future] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Store the transport."""
+        self._transport = transport
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        """Return the free space at the end of the buffer."""
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        """Take new data and pause reading if the buffer is full."""
+        self._end += nbytes
+        if self._end == len(self._buffer):
+            # the consumer can still use views, make room with the next read
+            self._transport.pause_reading()
+            self._paused = True
+        self._wakeup()
+
+    def eof_received(self) -> bool:
+        """Signal the end of output."""
+        self._eof = True
+        self._wakeup()
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        """Signal the end of output."""
+        self._eof = True
+        self._wakeup()
+
+    def close(self) -> None:
+        """Close the transport."""
+        if self._transport is not None:
+            self._transport.close()
+
+    async def read(self, size: int = -1) -> memoryview:
+        """Return up to size bytes, a empty view at the end of output."""
+        self._make_room()
+        while self._start == self._end and not self._eof:
+            await self._wait_data()
+
+        end = self._end if size < 0 else min(self._end, self._start + size)
+        return self._consume(end)
+
+    async def readexactly(self, size: int) -> memoryview:
+        """Return exactly size bytes.
+
+        Raise asyncio.IncompleteReadError at the end of output.
+        """
+        self._make_room()
+        while self._end - self._start < size:
+            if self._eof:
+                partial = bytes(self._consume(self._end))
+                raise asyncio.IncompleteReadError(partial, size)
+            if size > len(self._buffer):
+                self._grow(size)
+            await self._wait_data()
+
+        return self._consume(self._start + size)
+
+    async def readuntil(self, separator: bytes = b"\n") -> memoryview:
+        """Return the data up to and with the separator.
+
+        Raise asyncio.IncompleteReadError at the end of output.
+        """
+        self._make_room()
+        # position relative to start, keeps valid if the buffer is compacted
+        checked = 0
+        while True:
+            found = self._buffer.find(separator, self._start + checked, self._end)
+            if found >= 0:
+                return self._consume(found + len(separator))
+            if self._eof:
+                partial = bytes(self._consume(self._end))
+                raise asyncio.IncompleteReadError(partial, None)
+
+            checked = max(0, self._end - self._start - len(separator) + 1)
+            if self._end - self._start == len(self._buffer):
+                self._grow(len(self._buffer) * 2)
+            await self._wait_data()
+
+    def _consume(self, end: int) -> memoryview:
+        """Return the data until end and release it."""
+        start = self._start
+        self._start = end
+        return self._view[start:end]
+
+    async def _wait_data(self) -> None:
+        """Wait for new data or the end of output."""
+        self._make_room()
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _wakeup(self) -> None:
+        """Wake up a waiting read."""
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _make_room(self) -> None:
+        """Compact the buffer if the end is near and resume reading."""
+        if self._start and len(self._buffer) - self._end < len(self._buffer) // 4:
+            self._compact()
+        if self._paused and self._end < len(self._buffer):
+            self._paused = False
+            self._transport.resume_reading()
+
+    def _compact(self) -> None:
+        """Move pending data to the begin of the buffer."""
+        start = self._start
+        end = self._end
+        self._view[: end - start] = self._view[start:end]
+        self._start = 0
+        self._end = end - start
+
+    def _grow(self, size: int) -> None:
+        """Use a new buffer with room for size bytes, old views stay valid."""
+        pending = self._view[self._start:self._end]
+        _LOGGER.debug("Grow output buffer to %d bytes", size)
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._view[: len(pending)] = pending
+        self._start = 0
+        self._end = len(pending)
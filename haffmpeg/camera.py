@@ -1,17 +1,41 @@
 """For HA camera components."""
-from typing import Coroutine, Optional
+import asyncio
+import logging
+import re
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
+from .buffered import BufferedReader
 from .core import HAFFmpeg
+from .fmp4 import HAFFmpegFmp4
+from .timeout import asyncio_timeout
+
+_LOGGER = logging.getLogger(__name__)
+
+_RE_CONTENT_LENGTH = re.compile(rb"(?i)content-length:\s*(\d+)")
 
 
 class CameraMjpeg(HAFFmpeg):
     """Implement a camera they convert video stream to MJPEG."""
 
     def open_camera(
-        self, input_source: str, extra_cmd: Optional[str] = None
+        self,
+        input_source: str,
+        extra_cmd: Optional[str] = None,
+        buffered: bool = False,
     ) -> Coroutine:
         """Open FFmpeg process as mjpeg video stream.
 
+        With buffered the frames are read with a BufferedReader.
         Return A coroutine.
         """
         command = ["-an", "-c:v", "mjpeg"]
@@ -21,4 +45,494 @@ class CameraMjpeg(HAFFmpeg):
             input_source=input_source,
             output="-f mpjpeg -",
             extra_cmd=extra_cmd,
+            stdout_buffered=buffered,
+        )
+
+    def iter_frames(self, chunk_size: int = 65536) -> AsyncIterator[memoryview]:
+        """Return a async iterator over the JPEG frames of the stream.
+
+        Frames are memoryviews into a reused buffer, see MjpegFrameReader.
+        """
+        return _frame_reader(self.buffered_reader or self._proc.stdout, chunk_size)
+
+    def latest_frames(self, chunk_size: int = 65536) -> "MjpegLatestFrame":
+        """Return a reader they drain the stream and keep the newest frame.
+
+        Use it for slow consumers, FFmpeg never blocks on a full pipe.
+        """
+        return MjpegLatestFrame(
+            self.buffered_reader or self._proc.stdout, chunk_size=chunk_size
         )
+
+
+class MjpegFrameReader:
+    """Parse JPEG frames from a FFmpeg mpjpeg stream.
+
+    Frames are returned as memoryview into a reused buffer, a frame is only
+    valid until the next frame is read. Use bytes() to keep a frame.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        chunk_size: int = 65536,
+        buffer_size: int = 1048576,
+    ):
+        """Init frame reader."""
+        self._reader = reader
+        self._chunk_size = chunk_size
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def _reserve(self, size: int) -> None:
+        """Make room for size bytes at the end of the buffer."""
+        pending = self._view[self._start:self._end]
+
+        if len(pending) + size > len(self._buffer):
+            # Use a new buffer, old frame views stay valid
+            self._buffer = bytearray(max(len(self._buffer) * 2, len(pending) + size))
+            self._view = memoryview(self._buffer)
+        self._view[: len(pending)] = pending
+
+        self._start = 0
+        self._end = len(pending)
+
+    async def _fill(self) -> bool:
+        """Read the next chunk into the buffer."""
+        try:
+            data = await self._reader.read(self._chunk_size)
+        except OSError:
+            return False
+        if not data:
+            return False
+
+        end = self._end + len(data)
+        if end > len(self._buffer):
+            self._reserve(len(data))
+            end = self._end + len(data)
+        self._view[self._end:end] = data
+        self._end = end
+        return True
+
+    async def read_frame(self) -> Optional[memoryview]:
+        """Return the next JPEG frame or None at the end of the stream."""
+        while True:
+            header_end = self._buffer.find(b"\r\n\r\n", self._start, self._end)
+            if header_end >= 0:
+                break
+            if not await self._fill():
+                return None
+
+        match = _RE_CONTENT_LENGTH.search(self._buffer, self._start, header_end)
+        if match is None:
+            _LOGGER.warning("Missing Content-length in mpjpeg stream")
+            return None
+
+        self._start = header_end + 4
+        length = int(match.group(1))
+        while self._end - self._start < length:
+            if not await self._fill():
+                return None
+
+        start = self._start
+        self._start = end = start + length
+        return self._view[start:end]
+
+    def __aiter__(self) -> AsyncIterator[memoryview]:
+        """Iterate over JPEG frames."""
+        return self
+
+    async def __anext__(self) -> memoryview:
+        """Return the next JPEG frame."""
+        frame = await self.read_frame()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+
+class MjpegBufferedFrameReader:
+    """Parse JPEG frames from a mpjpeg stream of a BufferedReader.
+
+    Frames are memoryviews into the buffer of the reader, a frame is only
+    valid until the next frame is read.
+    """
+
+    def __init__(self, reader: BufferedReader):
+        """Init frame reader."""
+        self._reader = reader
+
+    async def read_frame(self) -> Optional[memoryview]:
+        """Return the next JPEG frame or None at the end of the stream."""
+        try:
+            header = await self._reader.readuntil(b"\r\n\r\n")
+            match = _RE_CONTENT_LENGTH.search(header)
+            if match is None:
+                _LOGGER.warning("Missing Content-length in mpjpeg stream")
+                return None
+            return await self._reader.readexactly(int(match.group(1)))
+        except asyncio.IncompleteReadError:
+            return None
+
+    def __aiter__(self) -> AsyncIterator[memoryview]:
+        """Iterate over JPEG frames."""
+        return self
+
+    async def __anext__(self) -> memoryview:
+        """Return the next JPEG frame."""
+        frame = await self.read_frame()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+
+def _frame_reader(
+    reader: Union[asyncio.StreamReader, BufferedReader], chunk_size: int
+) -> AsyncIterator[memoryview]:
+    """Return the frame reader of a stream or buffered reader."""
+    if isinstance(reader, BufferedReader):
+        return MjpegBufferedFrameReader(reader)
+    return MjpegFrameReader(reader, chunk_size=chunk_size)
+
+
+class MjpegLatestFrame:
+    """Conflate a mpjpeg stream to the newest complete frame.
+
+    A task read the stream at full speed, a frame they is not requested
+    before the next one is complete is dropped. A consumer get always the
+    newest frame and the latency don't grow with a slow consumer.
+    """
+
+    def __init__(
+        self,
+        reader: Union[asyncio.StreamReader, BufferedReader],
+        chunk_size: int = 65536,
+    ):
+        """Init latest frame reader and start reading."""
+        self._frames = _frame_reader(reader, chunk_size)
+        self._frame: Optional[bytes] = None
+        self._pending = False
+        self._ended = False
+        self._new_frame = asyncio.Event()
+        self.produced = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._task = asyncio.get_running_loop().create_task(self._read())
+
+    async def get_frame(self) -> Optional[bytes]:
+        """Return the next newest frame or None at the end of the stream."""
+        while not self._pending and not self._ended:
+            self._new_frame.clear()
+            await self._new_frame.wait()
+
+        if not self._pending:
+            return None
+        self._pending = False
+        self.delivered += 1
+        return self._frame
+
+    async def close(self) -> None:
+        """Stop reading the stream."""
+        self._task.cancel()
+        self._end()
+
+    def _end(self) -> None:
+        """Wake up a waiting consumer at the end of stream."""
+        self._ended = True
+        self._new_frame.set()
+
+    async def _read(self) -> None:
+        """Read all frames and keep the newest."""
+        async for view in self._frames:
+            if self._pending:
+                self.dropped += 1
+            self._frame = bytes(view)
+            self._pending = True
+            self.produced += 1
+            self._new_frame.set()
+
+        _LOGGER.debug("MJPEG stream ended")
+        self._end()
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        """Iterate over the newest frames."""
+        return self
+
+    async def __anext__(self) -> bytes:
+        """Return the next newest frame."""
+        frame = await self.get_frame()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    async def __aenter__(self) -> "MjpegLatestFrame":
+        """Use reader as async context manager."""
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        """Stop reading on exit."""
+        await self.close()
+
+
+class StreamSubscriber:
+    """Receive frames of a shared stream with a bounded queue."""
+
+    def __init__(
+        self,
+        unsubscribe: Callable[["StreamSubscriber"], Awaitable[None]],
+        queue_size: int,
+    ):
+        """Init subscriber."""
+        self._unsubscribe = unsubscribe
+        self._queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def put_frame(self, frame: Optional[bytes]) -> None:
+        """Queue a frame and drop the oldest one if the client is too slow."""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(frame)
+
+    async def get_frame(self) -> Optional[bytes]:
+        """Return the next frame or None if the stream is closed."""
+        return await self._queue.get()
+
+    async def close(self) -> None:
+        """Unsubscribe from the shared stream."""
+        await self._unsubscribe(self)
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        """Iterate over frames."""
+        return self
+
+    async def __anext__(self) -> bytes:
+        """Return the next frame."""
+        frame = await self.get_frame()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    async def __aenter__(self) -> "StreamSubscriber":
+        """Use subscriber as async context manager."""
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        """Unsubscribe on exit."""
+        await self.close()
+
+
+class MjpegSubscriber(StreamSubscriber):
+    """Receive JPEG frames of a MjpegBroadcaster channel."""
+
+    def __init__(self, broadcaster: "MjpegBroadcaster", key: Tuple, queue_size: int):
+        """Init subscriber."""
+        super().__init__(broadcaster.unsubscribe, queue_size)
+        self.key = key
+
+
+class _MjpegChannel:
+    """One shared FFmpeg process with its subscribers."""
+
+    def __init__(self, camera: CameraMjpeg):
+        """Init channel."""
+        self.camera = camera
+        self.subscribers: Set[MjpegSubscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+
+
+class MjpegBroadcaster:
+    """Share one MJPEG FFmpeg process per input source between many clients.
+
+    The process is started with the first subscriber and closed after the
+    last subscriber leaves. Every subscriber has a bounded queue, a slow
+    client drops its oldest frames and never stalls the shared pipe.
+    """
+
+    def __init__(self, ffmpeg_bin: str, queue_size: int = 2):
+        """Init broadcaster."""
+        self._ffmpeg = ffmpeg_bin
+        self._queue_size = queue_size
+        self._channels: Dict[Tuple, _MjpegChannel] = {}
+        self._lock = asyncio.Lock()
+
+    def subscribers(self, input_source: str, extra_cmd: Optional[str] = None) -> int:
+        """Return the number of subscribers of a input source."""
+        channel = self._channels.get((input_source, extra_cmd))
+        if channel is None:
+            return 0
+        return len(channel.subscribers)
+
+    async def subscribe(
+        self, input_source: str, extra_cmd: Optional[str] = None
+    ) -> Optional[MjpegSubscriber]:
+        """Subscribe to a input source and start FFmpeg if needed.
+
+        Return None if FFmpeg can't be started.
+        """
+        key = (input_source, extra_cmd)
+
+        async with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                camera = CameraMjpeg(self._ffmpeg)
+                if not await camera.open_camera(input_source, extra_cmd):
+                    _LOGGER.warning("Error starting FFmpeg.")
+                    return None
+
+                channel = _MjpegChannel(camera)
+                channel.task = asyncio.create_task(self._broadcast(key, channel))
+                self._channels[key] = channel
+
+            subscriber = MjpegSubscriber(self, key, self._queue_size)
+            channel.subscribers.add(subscriber)
+
+        return subscriber
+
+    async def unsubscribe(self, subscriber: MjpegSubscriber) -> None:
+        """Remove a subscriber and stop FFmpeg after the last one."""
+        async with self._lock:
+            channel = self._channels.get(subscriber.key)
+            if channel is None or subscriber not in channel.subscribers:
+                return
+
+            channel.subscribers.discard(subscriber)
+            if channel.subscribers:
+                return
+
+            del self._channels[subscriber.key]
+
+        channel.task.cancel()
+        await channel.camera.close()
+
+    async def close(self) -> None:
+        """Stop all FFmpeg processes and end all subscriptions."""
+        async with self._lock:
+            channels = list(self._channels.values())
+            self._channels.clear()
+
+        for channel in channels:
+            channel.task.cancel()
+            for subscriber in channel.subscribers:
+                subscriber.put_frame(None)
+        await asyncio.gather(*(channel.camera.close() for channel in channels))
+
+    async def _broadcast(self, key: Tuple, channel: _MjpegChannel) -> None:
+        """Read frames from FFmpeg and fan them out to all subscribers."""
+        async for view in channel.camera.iter_frames():
+            frame = bytes(view)
+            for subscriber in channel.subscribers:
+                subscriber.put_frame(frame)
+
+        _LOGGER.debug("MJPEG stream of %s ended", key[0])
+        # remove the channel first, a waiting subscribe start a new one
+        async with self._lock:
+            if self._channels.get(key) is channel:
+                del self._channels[key]
+            for subscriber in channel.subscribers:
+                subscriber.put_frame(None)
+        await channel.camera.close()
+
+
+class Fmp4Subscriber(StreamSubscriber):
+    """Receive the init segment and the fragments of a fragmented MP4.
+
+    The first frame is the cached init segment, every following frame is
+    a fragment they start with a key frame. A slow client drops whole
+    fragments.
+    """
+
+    def __init__(self, camera: "CameraFmp4", init: bytes, queue_size: int):
+        """Init subscriber."""
+        super().__init__(camera.unsubscribe, queue_size)
+        self._init: Optional[bytes] = init
+
+    async def get_frame(self) -> Optional[bytes]:
+        """Return the init segment, next fragment or None if closed."""
+        if self._init is not None:
+            init, self._init = self._init, None
+            return init
+        return await super().get_frame()
+
+
+class CameraFmp4(HAFFmpegFmp4):
+    """Implement a camera they copy the video stream into fragmented MP4.
+
+    Nothing is re-encoded. The init segment is cached, a new subscriber
+    get it at once and join with the next fragment.
+    """
+
+    def __init__(self, ffmpeg_bin: str, queue_size: int = 4):
+        """Init fragmented MP4 camera."""
+        super().__init__(ffmpeg_bin)
+
+        self._queue_size = queue_size
+        self._init: Optional[bytes] = None
+        self._init_ready = asyncio.Event()
+        self._subscribers: Set[Fmp4Subscriber] = set()
+
+    @property
+    def init_segment(self) -> Optional[bytes]:
+        """Return the cached init segment."""
+        return self._init
+
+    async def open_camera(
+        self,
+        input_source: str,
+        extra_cmd: Optional[str] = None,
+        audio: bool = False,
+    ) -> bool:
+        """Open FFmpeg process as fragmented MP4 stream."""
+        self._init = None
+        self._init_ready.clear()
+        return await self.open_fmp4(input_source, extra_cmd, audio)
+
+    async def subscribe(self, timeout: float = 10) -> Optional[Fmp4Subscriber]:
+        """Subscribe to the stream, wait for the init segment if needed.
+
+        Return None if the stream has no init segment inside of timeout.
+        """
+        try:
+            async with asyncio_timeout(timeout):
+                await self._init_ready.wait()
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Timeout while waiting of MP4 init segment")
+            return None
+        if self._init is None:
+            return None
+
+        subscriber = Fmp4Subscriber(self, self._init, self._queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        """Remove a subscriber."""
+        self._subscribers.discard(subscriber)
+
+    async def close(self, timeout: int = 5) -> None:
+        """Stop the stream and end all subscriptions."""
+        self._end()
+        await super().close(timeout)
+
+    def _end(self) -> None:
+        """Signal the end of stream to all subscribers."""
+        self._init = None
+        for subscriber in self._subscribers:
+            subscriber.put_frame(None)
+        self._subscribers.clear()
+        self._init_ready.set()
+
+    def _init_received(self, init: Optional[bytes]) -> None:
+        """Cache the init segment for new subscribers."""
+        self._init = init
+        self._init_ready.set()
+
+    def _fragment_received(self, fragment: bytes) -> None:
+        """Fan out a fragment to all subscribers."""
+        for subscriber in self._subscribers:
+            subscriber.put_frame(fragment)
+
+    def _stream_ended(self) -> None:
+        """End all subscriptions."""
+        self._end()
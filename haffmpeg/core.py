@@ -1,10 +1,15 @@
 """Base functionality of ffmpeg HA wrapper."""
 import asyncio
+from asyncio.subprocess import Process, SubprocessStreamProtocol
+from dataclasses import dataclass
 import logging
 import re
 import shlex
-from typing import List, Optional, Set
+import socket
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Set, Tuple
 
+from .buffered import BufferedReader
+from .progress import FFmpegProgress, ProgressReader
 from .timeout import asyncio_timeout
 
 _LOGGER = logging.getLogger(__name__)
@@ -12,9 +17,184 @@ _LOGGER = logging.getLogger(__name__)
 FFMPEG_STDOUT = "stdout"
 FFMPEG_STDERR = "stderr"
 
+READ_CHUNK_SIZE = 65536
+READ_LINE_LIMIT = 65536
+
+# share of the close timeout to wait after q and after SIGTERM
+CLOSE_QUIT_SHARE = 0.6
+CLOSE_TERMINATE_SHARE = 0.3
+
+CLOSE_QUIT = "quit"
+CLOSE_TERMINATE = "terminate"
+CLOSE_KILL = "kill"
+
+QUEUE_BLOCK = "block"
+QUEUE_DROP_OLDEST = "drop_oldest"
+QUEUE_DROP_NEWEST = "drop_newest"
+QUEUE_COALESCE = "coalesce"
+
 _BACKGROUND_TASKS: Set[asyncio.Task] = set()
 
 
+@dataclass
+class CloseStats:
+    """Stages of closing a FFmpeg process, times in seconds."""
+
+    stage: Optional[str] = None
+    quit_time: float = 0.0
+    terminate_time: float = 0.0
+    kill_time: float = 0.0
+
+
+@dataclass
+class CloseReport:
+    """Result of closing many FFmpeg processes.
+
+    Stage times are the longest time a process spent in the stage.
+    """
+
+    processes: int = 0
+    quit: int = 0
+    terminated: int = 0
+    killed: int = 0
+    quit_time: float = 0.0
+    terminate_time: float = 0.0
+    kill_time: float = 0.0
+    duration: float = 0.0
+
+
+async def _drain_process(proc: Process) -> None:
+    """Drop the output of a ending process and reap it."""
+    for stream in (proc.stdout, proc.stderr):
+        if stream is None:
+            continue
+        try:
+            while await stream.read(READ_CHUNK_SIZE):
+                pass
+        except (ConnectionError, RuntimeError):
+            # pipe is gone or read by a other task
+            pass
+    await proc.wait()
+
+
+async def close_all(instances: Iterable["HAFFmpeg"], timeout: int = 5) -> CloseReport:
+    """Close many FFmpeg instances concurrently inside of one timeout.
+
+    Every process get q, SIGTERM and SIGKILL like HAFFmpeg.close.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    running = [ffmpeg for ffmpeg in instances if ffmpeg.is_running]
+
+    results = await asyncio.gather(
+        *(ffmpeg.close(timeout) for ffmpeg in running), return_exceptions=True
+    )
+
+    report = CloseReport(processes=len(running))
+    for ffmpeg, result in zip(running, results):
+        if isinstance(result, Exception):
+            _LOGGER.error("Error while closing FFmpeg: %s", result)
+        stats = ffmpeg.close_stats
+        if stats is None:
+            continue
+        if stats.stage == CLOSE_QUIT:
+            report.quit += 1
+        elif stats.stage == CLOSE_TERMINATE:
+            report.terminated += 1
+        elif stats.stage == CLOSE_KILL:
+            report.killed += 1
+        report.quit_time = max(report.quit_time, stats.quit_time)
+        report.terminate_time = max(report.terminate_time, stats.terminate_time)
+        report.kill_time = max(report.kill_time, stats.kill_time)
+
+    report.duration = loop.time() - started
+    return report
+
+
+def _match_lines(chunk: bytes, cmp: Optional["re.Pattern[bytes]"]) -> List[str]:
+    """Return decoded lines of chunk they match with the pattern."""
+    if cmp is None:
+        return [
+            f"{line}\n" for line in chunk.decode(errors="replace").split("\n")[:-1]
+        ]
+
+    lines = []
+    line_end = 0
+    for match in cmp.finditer(chunk):
+        start = match.start()
+        if start < line_end:
+            # line is already in the list
+            continue
+        line_start = chunk.rfind(b"\n", 0, start) + 1
+        line_end = chunk.find(b"\n", start) + 1
+        lines.append(chunk[line_start:line_end].decode(errors="replace"))
+    return lines
+
+
+class WorkerQueue(asyncio.Queue):
+    """Queue of a worker with a overflow policy and drop counters.
+
+    With block the reader wait for free space and FFmpeg block on a full
+    pipe. drop_oldest and drop_newest drop a line if the queue is full.
+    coalesce replace the newest queued line if the new line has the same
+    key and drop the oldest line if the queue is full. maxsize 0 is
+    unbounded.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        policy: str = QUEUE_BLOCK,
+        key: Optional[Callable[[Any], Hashable]] = None,
+    ):
+        """Init worker queue."""
+        super().__init__(maxsize)
+        self.policy = policy
+        self._key = key or (lambda item: item)
+        self.high_water = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put_nowait(self, item: Any) -> None:
+        """Put a item into the queue and apply the overflow policy."""
+        if self.policy == QUEUE_COALESCE and self._coalesce(item):
+            return
+
+        if self.full() and self.policy != QUEUE_BLOCK:
+            if self.policy == QUEUE_DROP_NEWEST:
+                self.dropped += 1
+                return
+            self.get_nowait()
+            self.dropped += 1
+
+        super().put_nowait(item)
+        self.high_water = max(self.high_water, self.qsize())
+
+    def _coalesce(self, item: Any) -> bool:
+        """Replace the newest queued item if it has the same key."""
+        if not self._queue or self._queue[-1] is None:
+            return False
+        if self._key(self._queue[-1]) != self._key(item):
+            return False
+        self._queue[-1] = item
+        self.coalesced += 1
+        return True
+
+    async def put(self, item: Any) -> None:
+        """Put a item, only block policy wait for free space."""
+        if self.policy == QUEUE_BLOCK:
+            await super().put(item)
+        else:
+            self.put_nowait(item)
+
+    def put_end(self) -> None:
+        """Put the end marker None, drop the oldest item if full."""
+        if self.full():
+            self.get_nowait()
+            self.dropped += 1
+        super().put_nowait(None)
+
+
 class HAFFmpeg:
     """HA FFmpeg process async.
 
@@ -27,6 +207,10 @@ class HAFFmpeg:
         self._ffmpeg = ffmpeg_bin
         self._argv = None
         self._proc: Optional["asyncio.subprocess.Process"] = None
+        self._progress: Optional[ProgressReader] = None
+        self._close_stats: Optional[CloseStats] = None
+        self._last_output: Optional[float] = None
+        self._buffered: Optional[BufferedReader] = None
 
     @property
     def process(self) -> "asyncio.subprocess.Process":
@@ -40,16 +224,60 @@ class HAFFmpeg:
             return False
         return True
 
+    @property
+    def progress(self) -> Optional[FFmpegProgress]:
+        """Return live statistics if progress is enabled."""
+        if self._progress is None:
+            return None
+        return self._progress.stats
+
+    @property
+    def buffered_reader(self) -> Optional[BufferedReader]:
+        """Return the stdout reader if FFmpeg is opened with stdout_buffered."""
+        return self._buffered
+
+    @property
+    def last_output(self) -> Optional[float]:
+        """Return the loop time of the last output of FFmpeg.
+
+        If the progress pipe is read for the running process it is the last
+        time the position advanced, a stalled FFmpeg can still print
+        statistics.
+        """
+        if self.progress_started:
+            return self._progress.stats.advanced
+        return self._last_output
+
+    @property
+    def progress_started(self) -> bool:
+        """Return True if the running process report progress."""
+        return self._progress is not None and self._progress.started
+
+    def enable_progress(
+        self, callback: Optional[Callable[[FFmpegProgress], None]] = None
+    ) -> None:
+        """Read FFmpeg -progress output from a extra pipe.
+
+        Take effect with the next start of FFmpeg. Callback is called with
+        the statistics on every progress update.
+        """
+        self._progress = ProgressReader(callback)
+
     def _generate_ffmpeg_cmd(
         self,
         cmd: List[str],
         input_source: Optional[str],
         output: Optional[str],
         extra_cmd: Optional[str] = None,
+        input_cmd: Optional[List[str]] = None,
     ) -> None:
         """Generate ffmpeg command line."""
         self._argv = [self._ffmpeg]
 
+        # input options like decoder settings are in front of the input
+        if input_cmd is not None:
+            self._argv.extend(input_cmd)
+
         # start command init
         if input_source is not None:
             self._put_input(input_source)
@@ -103,6 +331,11 @@ class HAFFmpeg:
         """Clear member variable after close."""
         self._argv = None
         self._proc = None
+        if self._progress is not None:
+            self._progress.close()
+        if self._buffered is not None:
+            self._buffered.close()
+            self._buffered = None
 
     async def open(
         self,
@@ -112,8 +345,14 @@ class HAFFmpeg:
         extra_cmd: Optional[str] = None,
         stdout_pipe: bool = True,
         stderr_pipe: bool = False,
+        input_cmd: Optional[List[str]] = None,
+        stdout_buffered: bool = False,
     ) -> bool:
-        """Start a ffmpeg instance and pipe output."""
+        """Start a ffmpeg instance and pipe output.
+
+        With stdout_buffered stdout is read by a BufferedReader instead of
+        the process stdout StreamReader, see buffered_reader.
+        """
         stdout = asyncio.subprocess.PIPE if stdout_pipe else asyncio.subprocess.DEVNULL
         stderr = asyncio.subprocess.PIPE if stderr_pipe else asyncio.subprocess.DEVNULL
 
@@ -122,53 +361,161 @@ class HAFFmpeg:
             return True
 
         # set command line
-        self._generate_ffmpeg_cmd(cmd, input_source, output, extra_cmd)
+        self._generate_ffmpeg_cmd(cmd, input_source, output, extra_cmd, input_cmd)
+
+        # progress use a extra pipe, stdout and stderr stay untouched
+        pass_fds = []
+        if self._progress is not None:
+            self._argv[1:1] = self._progress.open_pipe()
+            pass_fds = self._progress.pass_fds
+
+        # pipe transports can't read into a buffer, socket transports can
+        sockets = socket.socketpair() if stdout_pipe and stdout_buffered else None
+        if sockets is not None:
+            stdout = sockets[1].fileno()
 
         # start ffmpeg
         _LOGGER.debug("Start FFmpeg with %s", str(self._argv))
+        self._last_output = None
         try:
-            self._proc = await asyncio.create_subprocess_exec(
-                *self._argv,
-                bufsize=0,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=stdout,
-                stderr=stderr,
-                close_fds=False,
-            )
+            self._proc = await self._create_process(stdout, stderr, pass_fds)
+            if self._progress is not None:
+                await self._progress.start()
+            if sockets is not None:
+                sockets[1].close()
+                _, self._buffered = await self._loop.connect_accepted_socket(
+                    BufferedReader, sockets[0]
+                )
         except Exception as err:  # pylint: disable=broad-except
             _LOGGER.exception("FFmpeg fails %s", err)
+            if sockets is not None:
+                for sock in sockets:
+                    sock.close()
+            # don't leave a spawned FFmpeg running without owner
+            if self._proc is not None:
+                self._signal(self._proc, self._proc.kill)
+                self._discard_output(self._proc)
             self._clear()
             return False
 
         return self._proc is not None
 
+    def send_command(self, target: str, command: str, argument: str = "") -> bool:
+        """Send a command to filters of the running FFmpeg.
+
+        Like the c key of the FFmpeg console, target is a filter name or a
+        labeled instance like volume@gain. Return False if not running.
+        """
+        if not self.is_running:
+            _LOGGER.warning("Can't send command, FFmpeg isn't running!")
+            return False
+
+        _LOGGER.debug("Send command %s %s %s", target, command, argument)
+        self._proc.stdin.write(f"c{target} -1 {command} {argument}\n".encode())
+        return True
+
+    async def _create_process(
+        self, stdout: int, stderr: int, pass_fds: List[int]
+    ) -> "asyncio.subprocess.Process":
+        """Start the FFmpeg process with the generated command line."""
+        return await asyncio.create_subprocess_exec(
+            *self._argv,
+            bufsize=0,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=stdout,
+            stderr=stderr,
+            # pass_fds requires close_fds
+            close_fds=bool(pass_fds),
+            pass_fds=pass_fds,
+        )
+
+    @property
+    def close_stats(self) -> Optional[CloseStats]:
+        """Return the stages of the last close."""
+        return self._close_stats
+
     async def close(self, timeout=5) -> None:
-        """Stop a ffmpeg instance."""
+        """Stop a ffmpeg instance.
+
+        Send q and escalate to SIGTERM and SIGKILL, all inside of timeout.
+        """
         if not self.is_running:
             _LOGGER.debug("FFmpeg isn't running!")
             return
 
+        proc = self._proc
+        stats = self._close_stats = CloseStats()
+        deadline = self._loop.time() + timeout
+
         # Can't use communicate because we attach the output to a streamreader
         # send stop to ffmpeg
         try:
-            self._proc.stdin.write(b"q")
-            async with asyncio_timeout(timeout):
-                await self._proc.wait()
-            _LOGGER.debug("Close FFmpeg process")
+            try:
+                proc.stdin.write(b"q")
+            except (AttributeError, ConnectionError, RuntimeError):
+                pass
+            stats.stage = CLOSE_QUIT
+            started = self._loop.time()
+            ended = await self._wait_exit(
+                proc, min(deadline, started + timeout * CLOSE_QUIT_SHARE)
+            )
+            stats.quit_time = self._loop.time() - started
+            if ended:
+                _LOGGER.debug("Close FFmpeg process")
+                return
+
+            _LOGGER.warning("Timeout while waiting of FFmpeg, terminate it")
+            stats.stage = CLOSE_TERMINATE
+            started = self._loop.time()
+            self._signal(proc, proc.terminate)
+            self._discard_output(proc)
+            ended = await self._wait_exit(
+                proc, min(deadline, started + timeout * CLOSE_TERMINATE_SHARE)
+            )
+            stats.terminate_time = self._loop.time() - started
+            if ended:
+                return
 
-        except (asyncio.TimeoutError, ValueError):
-            _LOGGER.warning("Timeout while waiting of FFmpeg")
-            self.kill()
+            _LOGGER.warning("FFmpeg ignores SIGTERM, kill it")
+            stats.stage = CLOSE_KILL
+            started = self._loop.time()
+            self._signal(proc, proc.kill)
+            await self._wait_exit(proc, deadline)
+            stats.kill_time = self._loop.time() - started
 
         finally:
             self._clear()
 
+    async def _wait_exit(self, proc: Process, deadline: float) -> bool:
+        """Wait until the process ended or the deadline."""
+        try:
+            async with asyncio_timeout(max(deadline - self._loop.time(), 0)):
+                await proc.wait()
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    @staticmethod
+    def _signal(proc: Process, send: Callable[[], None]) -> None:
+        """Send a signal to a process they may be ended already."""
+        try:
+            send()
+        except ProcessLookupError:
+            pass
+
+    def _discard_output(self, proc: Process) -> None:
+        """Read and drop the remaining output in the background."""
+        # a closed socket let blocked writes of FFmpeg fail
+        if self._buffered is not None:
+            self._buffered.close()
+        background_task = self._loop.create_task(_drain_process(proc))
+        _BACKGROUND_TASKS.add(background_task)
+        background_task.add_done_callback(_BACKGROUND_TASKS.discard)
+
     def kill(self) -> None:
         """Kill ffmpeg job."""
-        self._proc.kill()
-        background_task = asyncio.create_task(self._proc.communicate())
-        _BACKGROUND_TASKS.add(background_task)
-        background_task.add_done_callback(_BACKGROUND_TASKS.remove)
+        self._signal(self._proc, self._proc.kill)
+        self._discard_output(self._proc)
 
     async def get_reader(self, source=FFMPEG_STDOUT) -> asyncio.StreamReader:
         """Create and return streamreader."""
@@ -184,10 +531,34 @@ class HAFFmpegWorker(HAFFmpeg):
         """Init noise sensor."""
         super().__init__(ffmpeg_bin)
 
-        self._queue = asyncio.Queue()
+        self._queue = WorkerQueue(key=self._queue_key)
+        self._queue_options: Optional[Tuple[int, str]] = None
         self._input = None
         self._read_task = None
 
+    @property
+    def queue(self) -> WorkerQueue:
+        """Return the queue with the high water mark and drop counters."""
+        return self._queue
+
+    def set_queue(self, maxsize: int = 0, policy: str = QUEUE_BLOCK) -> None:
+        """Limit the queue of matched lines, take effect with the next start.
+
+        maxsize 0 is unbounded, see WorkerQueue for the policies.
+        """
+        self._queue_options = (maxsize, policy)
+
+    def _apply_queue(self) -> None:
+        """Use a new queue if the options changed, before the start."""
+        if self._queue_options is not None:
+            maxsize, policy = self._queue_options
+            self._queue = WorkerQueue(maxsize, policy, self._queue_key)
+            self._queue_options = None
+
+    def _queue_key(self, line: str) -> Hashable:
+        """Return the key of a line they is used to coalesce lines."""
+        return line
+
     async def close(self, timeout: int = 5) -> None:
         """Stop a ffmpeg instance.
 
@@ -198,34 +569,69 @@ class HAFFmpegWorker(HAFFmpeg):
 
         return await super().close(timeout)
 
-    async def _process_lines(self, pattern: Optional[str] = None) -> None:
-        """Read line from pipe they match with pattern."""
-        if pattern is not None:
-            cmp = re.compile(pattern)
+    async def _process_lines(
+        self,
+        pattern: Optional[str] = None,
+        reader: Optional[asyncio.StreamReader] = None,
+        queue: Optional[WorkerQueue] = None,
+    ) -> None:
+        """Read line from pipe they match with pattern.
+
+        Read from worker input into worker queue if no reader or queue is set.
+        The end marker None is put also if the reading is cancelled.
+        """
+        if reader is None:
+            reader = self._input
+        if queue is None:
+            queue = self._queue
+
+        cmp = None if pattern is None else re.compile(pattern.encode())
 
         _LOGGER.debug("Start working with pattern '%s'.", pattern)
 
-        # read lines
+        try:
+            await self._read_lines(cmp, reader, queue)
+            await self._proc.wait()
+        finally:
+            queue.put_end()
+            _LOGGER.debug("Stopped reading ffmpeg output.")
+
+    async def _read_lines(
+        self,
+        cmp: Optional["re.Pattern[bytes]"],
+        reader: asyncio.StreamReader,
+        queue: WorkerQueue,
+    ) -> None:
+        """Read chunks and split them into lines, only matching are decoded."""
+        pending = b""
         while self.is_running:
             try:
-                line = await self._input.readline()
-                if not line:
-                    break
-                line = line.decode()
+                data = await reader.read(READ_CHUNK_SIZE)
             except Exception:  # pylint: disable=broad-except
                 break
+            if not data:
+                break
+            self._last_output = self._loop.time()
+
+            end = data.rfind(b"\n") + 1
+            if not end:
+                pending = pending + data if len(pending) < READ_LINE_LIMIT else data
+                continue
+
+            chunk = pending + data[:end] if pending else data[:end]
+            pending = data[end:]
 
-            # pylint: disable-next=possibly-used-before-assignment
-            match = True if pattern is None else cmp.search(line)
-            if match:
+            for line in _match_lines(chunk, cmp):
                 _LOGGER.debug("Process: %s", line)
-                await self._queue.put(line)
+                if queue.full():
+                    await queue.put(line)
+                else:
+                    queue.put_nowait(line)
 
-        try:
-            await self._proc.wait()
-        finally:
-            await self._queue.put(None)
-            _LOGGER.debug("Stopped reading ffmpeg output.")
+        # last line without newline
+        if pending:
+            for line in _match_lines(pending + b"\n", cmp):
+                await queue.put(line.rstrip("\n"))
 
     async def _worker_process(self) -> None:
         """Process output line."""
@@ -239,6 +645,7 @@ class HAFFmpegWorker(HAFFmpeg):
         extra_cmd: Optional[str] = None,
         pattern: Optional[str] = None,
         reading: str = FFMPEG_STDERR,
+        input_cmd: Optional[List[str]] = None,
     ) -> None:
         """Start ffmpeg do process data from output."""
         if self.is_running:
@@ -253,6 +660,7 @@ class HAFFmpegWorker(HAFFmpeg):
             stderr = False
 
         # start ffmpeg and reading to queue
+        self._apply_queue()
         await self.open(
             cmd=cmd,
             input_source=input_source,
@@ -260,6 +668,7 @@ class HAFFmpegWorker(HAFFmpeg):
             extra_cmd=extra_cmd,
             stdout_pipe=stdout,
             stderr_pipe=stderr,
+            input_cmd=input_cmd,
         )
 
         self._input = await self.get_reader(reading)
@@ -267,3 +676,146 @@ class HAFFmpegWorker(HAFFmpeg):
         # start background processing
         self._read_task = self._loop.create_task(self._process_lines(pattern))
         self._loop.create_task(self._worker_process())
+
+
+class _OutputProtocol(SubprocessStreamProtocol):
+    """Subprocess protocol they pass one pipe to callbacks instead of a reader."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        fd: int,
+        data_received: Callable[[bytes], None],
+        connection_lost: Callable[[], None],
+    ):
+        """Init output protocol."""
+        super().__init__(limit=READ_LINE_LIMIT, loop=loop)
+        self._fd = fd
+        self._data_received = data_received
+        self._connection_lost = connection_lost
+
+    def pipe_data_received(self, fd: int, data: bytes) -> None:
+        """Pass data of the output pipe to the callback."""
+        if fd == self._fd:
+            self._data_received(data)
+        else:
+            super().pipe_data_received(fd, data)
+
+    def pipe_connection_lost(self, fd: int, exc: Optional[Exception]) -> None:
+        """Signal the end of the output pipe."""
+        super().pipe_connection_lost(fd, exc)
+        if fd == self._fd:
+            self._connection_lost()
+
+
+class HAFFmpegProtocolWorker(HAFFmpeg):
+    """Process FFmpeg output lines inside the subprocess protocol.
+
+    Alternative to HAFFmpegWorker without reader task, worker task and
+    queue. Matching lines are passed to _line_received as they arrive.
+    """
+
+    def __init__(self, ffmpeg_bin: str):
+        """Init protocol worker."""
+        super().__init__(ffmpeg_bin)
+
+        self._reading_fd: Optional[int] = None
+        self._pattern: Optional["re.Pattern[bytes]"] = None
+        self._pending = b""
+
+    async def _create_process(
+        self, stdout: int, stderr: int, pass_fds: List[int]
+    ) -> "asyncio.subprocess.Process":
+        """Start the FFmpeg process with the output protocol."""
+        if self._reading_fd is None:
+            return await super()._create_process(stdout, stderr, pass_fds)
+
+        transport, protocol = await self._loop.subprocess_exec(
+            lambda: _OutputProtocol(
+                self._loop,
+                self._reading_fd,
+                self._output_received,
+                self._output_closed,
+            ),
+            *self._argv,
+            bufsize=0,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=stdout,
+            stderr=stderr,
+            # pass_fds requires close_fds
+            close_fds=bool(pass_fds),
+            pass_fds=pass_fds,
+        )
+        return Process(transport, protocol, self._loop)
+
+    def _output_received(self, data: bytes) -> None:
+        """Record the output time and process the data."""
+        self._last_output = self._loop.time()
+        self._data_received(data)
+
+    def _data_received(self, data: bytes) -> None:
+        """Split output into lines and process the matching ones."""
+        end = data.rfind(b"\n") + 1
+        if not end:
+            self._pending = (
+                self._pending + data if len(self._pending) < READ_LINE_LIMIT else data
+            )
+            return
+
+        chunk = self._pending + data[:end] if self._pending else data[:end]
+        self._pending = data[end:]
+
+        for line in _match_lines(chunk, self._pattern):
+            self._line_received(line)
+
+    def _output_closed(self) -> None:
+        """Process the last line and signal the end of output."""
+        if self._pending:
+            for line in _match_lines(self._pending + b"\n", self._pattern):
+                self._line_received(line.rstrip("\n"))
+            self._pending = b""
+
+        _LOGGER.debug("Stopped reading ffmpeg output.")
+        self._worker_stopped()
+
+    def _line_received(self, line: str) -> None:
+        """Process output line."""
+        raise NotImplementedError()
+
+    def _worker_started(self) -> None:
+        """FFmpeg is started."""
+
+    def _worker_stopped(self) -> None:
+        """FFmpeg output is closed."""
+
+    async def start_worker(
+        self,
+        cmd: List[str],
+        input_source: str,
+        output: Optional[str] = None,
+        extra_cmd: Optional[str] = None,
+        pattern: Optional[str] = None,
+        reading: str = FFMPEG_STDERR,
+        input_cmd: Optional[List[str]] = None,
+    ) -> bool:
+        """Start ffmpeg do process data from output."""
+        if self.is_running:
+            _LOGGER.warning("Can't start worker. It is allready running!")
+            return False
+
+        self._reading_fd = 2 if reading == FFMPEG_STDERR else 1
+        self._pattern = None if pattern is None else re.compile(pattern.encode())
+        self._pending = b""
+
+        is_open = await self.open(
+            cmd=cmd,
+            input_source=input_source,
+            output=output,
+            extra_cmd=extra_cmd,
+            stdout_pipe=reading != FFMPEG_STDERR,
+            stderr_pipe=reading == FFMPEG_STDERR,
+            input_cmd=input_cmd,
+        )
+        if is_open:
+            self._worker_started()
+        return is_open
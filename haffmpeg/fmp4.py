@@ -0,0 +1,151 @@
+"""Copy streams into fragmented MP4 and read them."""
+import asyncio
+import logging
+import struct
+from typing import Optional, Tuple
+
+from .core import HAFFmpeg
+
+_LOGGER = logging.getLogger(__name__)
+
+# movflags for a fragmented MP4 they start every fragment with a key frame
+FMP4_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+
+_BOX_HEADER = struct.Struct(">I4s")
+_BOX_LARGE_SIZE = struct.Struct(">Q")
+
+_INIT_BOXES = (b"ftyp", b"moov")
+
+
+class Fmp4Reader:
+    """Split a fragmented MP4 stream into init segment and fragments.
+
+    The init segment is ftyp and moov, a fragment is all boxes up to and
+    including the next mdat, like moof and mdat.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader):
+        """Init fragmented MP4 reader."""
+        self._reader = reader
+        self._next_box: Optional[Tuple[bytes, bytes]] = None
+
+    async def read_init(self) -> Optional[bytes]:
+        """Return the init segment or None on end of stream."""
+        boxes = []
+        while True:
+            box = await self._read_box()
+            if box is None:
+                return None
+            box_type, data = box
+            if box_type not in _INIT_BOXES:
+                # first box of the first fragment
+                self._next_box = box
+                break
+            boxes.append(data)
+            if box_type == b"moov":
+                break
+        return b"".join(boxes)
+
+    async def read_fragment(self) -> Optional[bytes]:
+        """Return the next fragment or None on end of stream."""
+        boxes = []
+        while True:
+            box = await self._read_box()
+            if box is None:
+                return None
+            box_type, data = box
+            boxes.append(data)
+            if box_type == b"mdat":
+                return b"".join(boxes)
+
+    async def _read_box(self) -> Optional[Tuple[bytes, bytes]]:
+        """Return type and data with header of the next box."""
+        if self._next_box is not None:
+            box, self._next_box = self._next_box, None
+            return box
+
+        try:
+            header = await self._reader.readexactly(_BOX_HEADER.size)
+            size, box_type = _BOX_HEADER.unpack(header)
+            if size == 1:
+                large = await self._reader.readexactly(_BOX_LARGE_SIZE.size)
+                header += large
+                size = _BOX_LARGE_SIZE.unpack(large)[0]
+            if size < len(header):
+                # size 0 (box until end of file) isn't used in a fragmented stream
+                raise ValueError(f"Invalid MP4 box size {size}")
+            body = await self._reader.readexactly(size - len(header))
+        except asyncio.IncompleteReadError:
+            return None
+        return box_type, header + body
+
+
+class HAFFmpegFmp4(HAFFmpeg):
+    """Copy a stream into fragmented MP4 and read the fragments.
+
+    Subclasses process the init segment with _init_received and every
+    fragment with _fragment_received.
+    """
+
+    def __init__(self, ffmpeg_bin: str):
+        """Init fragmented MP4 process."""
+        super().__init__(ffmpeg_bin)
+        self._read_task: Optional[asyncio.Task] = None
+
+    async def open_fmp4(
+        self,
+        input_source: str,
+        extra_cmd: Optional[str] = None,
+        audio: bool = False,
+    ) -> bool:
+        """Open FFmpeg process and read the fragmented MP4 stream.
+
+        Video is copied, audio is encoded to AAC if enabled because many
+        camera audio codecs don't fit into MP4.
+        """
+        command = ["-c:v", "copy"]
+        command.extend(["-c:a", "aac"] if audio else ["-an"])
+
+        is_open = await self.open(
+            cmd=command,
+            input_source=input_source,
+            output=f"-f mp4 -movflags {FMP4_MOVFLAGS} -",
+            extra_cmd=extra_cmd,
+        )
+        if is_open:
+            self._read_task = self._loop.create_task(self._read_fmp4())
+        return is_open
+
+    async def close(self, timeout: int = 5) -> None:
+        """Stop reading and FFmpeg."""
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+
+        await super().close(timeout)
+
+    async def _read_fmp4(self) -> None:
+        """Read the init segment and the fragments."""
+        reader = Fmp4Reader(self._proc.stdout)
+        try:
+            init = await reader.read_init()
+            self._init_received(init)
+            while init is not None:
+                fragment = await reader.read_fragment()
+                if fragment is None:
+                    break
+                self._fragment_received(fragment)
+        except ValueError as err:
+            _LOGGER.error("Error in MP4 stream: %s", err)
+
+        _LOGGER.debug("MP4 stream ended")
+        self._stream_ended()
+
+    def _init_received(self, init: Optional[bytes]) -> None:
+        """Process the init segment, None if the stream ended before."""
+
+    def _fragment_received(self, fragment: bytes) -> None:
+        """Process a fragment."""
+
+    def _stream_ended(self) -> None:
+        """Process the end of stream."""
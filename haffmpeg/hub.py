@@ -0,0 +1,226 @@
+"""Share one decode of a stream between camera, snapshots and motion."""
+import asyncio
+from functools import partial
+import logging
+from typing import Callable, List, Optional, Set
+
+from .camera import MjpegFrameReader, StreamSubscriber
+from .core import HAFFmpeg
+from .pipe import OutputPipe
+from .sensor import MOTION_DECODE_LOW_CPU, MotionDecode, _scene_score
+from .state import MotionDetector, TimerService, TimerWheel
+from .timeout import asyncio_timeout
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StreamHub(HAFFmpeg):
+    """Decode a stream once for the live MJPEG, snapshots and motion.
+
+    A split filter feed three outputs of one FFmpeg, every output is
+    written to a own pipe. Live frames are read like MjpegBroadcaster
+    subscriptions, the newest snapshot like LiveImageFrame and the scene
+    scores like SensorMotion in scene score mode.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Optional[Callable] = None,
+        timers: Optional[TimerService] = None,
+        queue_size: int = 2,
+    ):
+        """Init stream hub."""
+        super().__init__(ffmpeg_bin)
+
+        self._queue_size = queue_size
+        self._snapshot_interval: float = 10
+        self._changes: float = 10
+        self._decode = MOTION_DECODE_LOW_CPU
+        self._score: Optional[float] = None
+        self._image: Optional[bytes] = None
+        self._image_event = asyncio.Event()
+        self._subscribers: Set[StreamSubscriber] = set()
+        self._pipes = [OutputPipe(), OutputPipe(), OutputPipe()]
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self._detector = MotionDetector(
+            partial(self._loop.call_soon, callback or (lambda state: None)),
+            timers or TimerWheel.for_loop(self._loop),
+        )
+
+    @property
+    def image(self) -> Optional[bytes]:
+        """Return the newest snapshot."""
+        return self._image
+
+    @property
+    def changes(self) -> float:
+        """Return the scene change threshold in percent."""
+        return self._changes
+
+    @changes.setter
+    def changes(self, changes: float) -> None:
+        """Set the threshold, a running FFmpeg is not restarted."""
+        self._changes = changes
+
+    @property
+    def scene_score(self) -> Optional[float]:
+        """Return the last scene score."""
+        return self._score
+
+    def set_options(
+        self,
+        snapshot_interval: float = 10,
+        time_reset: int = 60,
+        time_repeat: int = 0,
+        repeat: int = 0,
+        changes: float = 10,
+        decode: MotionDecode = MOTION_DECODE_LOW_CPU,
+    ) -> None:
+        """Set option parameter for snapshots and motion detection.
+
+        The fps, width and gray settings of decode apply only to the motion
+        branch, key frame decode is ignored because the live stream need
+        all frames.
+        """
+        if decode.keyframes:
+            _LOGGER.warning("Key frame decode is not supported by the hub")
+        self._snapshot_interval = snapshot_interval
+        self._detector.time_reset = time_reset
+        self._detector.time_repeat = time_repeat
+        self._detector.repeat = repeat
+        self._changes = changes
+        self._decode = decode
+
+    def _filter_graph(self, scores: str) -> str:
+        """Return the split filter graph for the three outputs."""
+        # the url is a filter option, escape the : for option and graph level
+        scores = scores.replace(":", "\\\\:")
+        motion = ",".join(
+            [
+                *self._decode.filters,
+                "select=gte(scene\\,0)",
+                f"metadata=mode=print:key=lavfi.scene_score:file={scores}:direct=1",
+            ]
+        )
+        return (
+            "[0:v:0]split=3[live][snap][motion];"
+            f"[snap]fps=1/{self._snapshot_interval}[snapout];"
+            f"[motion]{motion}[motionout]"
+        )
+
+    async def open_hub(
+        self, input_source: str, extra_cmd: Optional[str] = None
+    ) -> bool:
+        """Open FFmpeg process with the live, snapshot and motion outputs."""
+        live, snapshots, scores = (pipe.open_pipe() for pipe in self._pipes)
+
+        is_open = await self.open(
+            cmd=["-filter_complex", self._filter_graph(scores)],
+            input_source=input_source,
+            output=(
+                f"-map [live] -c:v mjpeg -f mpjpeg {live} "
+                f"-map [snapout] -c:v mjpeg -f mpjpeg {snapshots} "
+                "-map [motionout] -f null -"
+            ),
+            extra_cmd=extra_cmd,
+            stdout_pipe=False,
+        )
+        if not is_open:
+            for pipe in self._pipes:
+                pipe.close()
+            return False
+
+        live, snapshots, scores = [await pipe.start() for pipe in self._pipes]
+        self._detector.start()
+        self._running = True
+        self._tasks = [
+            self._loop.create_task(self._read_live(live)),
+            self._loop.create_task(self._read_snapshots(snapshots)),
+            self._loop.create_task(self._read_scores(scores)),
+        ]
+        return True
+
+    async def _create_process(
+        self, stdout: int, stderr: int, pass_fds: List[int]
+    ) -> "asyncio.subprocess.Process":
+        """Pass the output pipes to FFmpeg."""
+        pass_fds = [*pass_fds, *(pipe.write_fd for pipe in self._pipes)]
+        return await super()._create_process(stdout, stderr, pass_fds)
+
+    def subscribe(self) -> StreamSubscriber:
+        """Subscribe to the live MJPEG frames."""
+        subscriber = StreamSubscriber(self.unsubscribe, self._queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        """Remove a subscriber."""
+        self._subscribers.discard(subscriber)
+
+    async def get_image(self, timeout: int = 15) -> Optional[bytes]:
+        """Return the newest snapshot, wait for the first one."""
+        try:
+            async with asyncio_timeout(timeout):
+                await self._image_event.wait()
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Timeout reading image.")
+            return None
+
+        return self._image
+
+    async def close(self, timeout: int = 5) -> None:
+        """Stop FFmpeg and end all subscriptions."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._end()
+        self._image = None
+        self._image_event.clear()
+
+        # nobody read the pipes anymore, FFmpeg would block on a full pipe
+        for pipe in self._pipes:
+            pipe.close()
+        await super().close(timeout)
+
+    def _end(self) -> None:
+        """Signal the end of stream to all consumers."""
+        if not self._running:
+            return
+        self._running = False
+        for subscriber in self._subscribers:
+            subscriber.put_frame(None)
+        self._subscribers.clear()
+        self._detector.stop()
+
+    async def _read_live(self, reader: asyncio.StreamReader) -> None:
+        """Fan out the live frames to all subscribers."""
+        async for view in MjpegFrameReader(reader):
+            if not self._subscribers:
+                continue
+            frame = bytes(view)
+            for subscriber in self._subscribers:
+                subscriber.put_frame(frame)
+
+        _LOGGER.debug("Live stream ended")
+        self._end()
+
+    async def _read_snapshots(self, reader: asyncio.StreamReader) -> None:
+        """Keep the newest snapshot."""
+        async for view in MjpegFrameReader(reader):
+            self._image = bytes(view)
+            self._image_event.set()
+
+        _LOGGER.debug("Snapshot stream ended")
+
+    async def _read_scores(self, reader: asyncio.StreamReader) -> None:
+        """Feed the scene scores into the motion detection."""
+        while line := await reader.readline():
+            if b"lavfi.scene_score=" not in line:
+                continue
+            self._score = _scene_score(line.decode(errors="replace").strip())
+            if self._score is not None and self._score > self._changes / 100:
+                self._detector.motion()
+
+        _LOGGER.debug("Scene score stream ended")
@@ -0,0 +1,53 @@
+"""Extra output pipes of FFmpeg."""
+import asyncio
+import os
+from typing import Optional
+
+
+class OutputPipe:
+    """A extra pipe of FFmpeg they is read as stream.
+
+    The write end is passed to FFmpeg with pass_fds and closed in this
+    process after FFmpeg is started.
+    """
+
+    def __init__(self):
+        """Init output pipe."""
+        self._read_fd: Optional[int] = None
+        self._write_fd: Optional[int] = None
+        self._transport: Optional[asyncio.ReadTransport] = None
+
+    @property
+    def write_fd(self) -> Optional[int]:
+        """Return the file descriptor they need to be passed to FFmpeg."""
+        return self._write_fd
+
+    def open_pipe(self) -> str:
+        """Create the pipe and return the FFmpeg url."""
+        self.close()
+        self._read_fd, self._write_fd = os.pipe()
+        return f"pipe:{self._write_fd}"
+
+    async def start(self) -> asyncio.StreamReader:
+        """Close the write end after FFmpeg is started and return a reader."""
+        loop = asyncio.get_running_loop()
+        os.close(self._write_fd)
+        self._write_fd = None
+
+        reader = asyncio.StreamReader()
+        self._transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(self._read_fd, "rb", 0),
+        )
+        self._read_fd = None
+        return reader
+
+    def close(self) -> None:
+        """Close the pipe."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        for fd in (self._read_fd, self._write_fd):
+            if fd is not None:
+                os.close(fd)
+        self._read_fd = self._write_fd = None
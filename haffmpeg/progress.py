@@ -0,0 +1,124 @@
+"""Live statistics from FFmpeg -progress output."""
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import Callable, List, Optional
+
+from .pipe import OutputPipe
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class FFmpegProgress:
+    """Last progress block reported by FFmpeg."""
+
+    frame: int = 0
+    fps: float = 0.0
+    bitrate: Optional[float] = None
+    total_size: Optional[int] = None
+    out_time: float = 0.0
+    dup_frames: int = 0
+    drop_frames: int = 0
+    speed: Optional[float] = None
+    ended: bool = False
+    updated: Optional[float] = None
+    advanced: Optional[float] = None
+
+    @property
+    def realtime(self) -> Optional[bool]:
+        """Return True if FFmpeg keeps up with realtime."""
+        if self.speed is None:
+            return None
+        return self.speed >= 1
+
+
+def _parse_float(value: str, unit: str = "") -> Optional[float]:
+    """Parse a FFmpeg progress number, N/A is None."""
+    try:
+        return float(value.strip().removesuffix(unit))
+    except ValueError:
+        return None
+
+
+class ProgressReader:
+    """Read -progress key=value blocks from a extra pipe of FFmpeg."""
+
+    def __init__(self, callback: Optional[Callable[[FFmpegProgress], None]] = None):
+        """Init progress reader."""
+        self.stats = FFmpegProgress()
+        self._callback = callback
+        self._block = {}
+        self._pipe = OutputPipe()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        """Return True if the pipe is read for the current process."""
+        return self._task is not None
+
+    @property
+    def pass_fds(self) -> List[int]:
+        """Return the file descriptors they need to be passed to FFmpeg."""
+        if self._pipe.write_fd is None:
+            return []
+        return [self._pipe.write_fd]
+
+    def open_pipe(self) -> List[str]:
+        """Create the progress pipe and return the FFmpeg arguments."""
+        self.close()
+        self.stats = FFmpegProgress()
+        return ["-progress", self._pipe.open_pipe()]
+
+    async def start(self) -> None:
+        """Start reading the pipe after FFmpeg is started."""
+        reader = await self._pipe.start()
+        self._task = asyncio.get_running_loop().create_task(self._read(reader))
+
+    def close(self) -> None:
+        """Stop reading and close the pipe."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._pipe.close()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        """Parse progress blocks."""
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key == "progress":
+                self._update(value)
+            else:
+                self._block[key] = value
+
+        _LOGGER.debug("Stopped reading ffmpeg progress.")
+
+    def _update(self, progress: str) -> None:
+        """Update statistics from a finished block."""
+        block = self._block
+        self._block = {}
+        stats = self.stats
+        position = (stats.frame, stats.out_time)
+
+        stats.frame = int(_parse_float(block.get("frame", "")) or 0)
+        stats.fps = _parse_float(block.get("fps", "")) or 0.0
+        stats.bitrate = _parse_float(block.get("bitrate", ""), "kbits/s")
+        total_size = _parse_float(block.get("total_size", ""))
+        stats.total_size = None if total_size is None else int(total_size)
+        out_time = _parse_float(block.get("out_time_us", ""))
+        if out_time is not None:
+            stats.out_time = out_time / 1000000
+        stats.dup_frames = int(_parse_float(block.get("dup_frames", "")) or 0)
+        stats.drop_frames = int(_parse_float(block.get("drop_frames", "")) or 0)
+        stats.speed = _parse_float(block.get("speed", ""), "x")
+        stats.ended = progress == "end"
+        stats.updated = asyncio.get_running_loop().time()
+        # a stalled input still print blocks, only a new position is output
+        if (stats.frame, stats.out_time) > position:
+            stats.advanced = stats.updated
+
+        if self._callback is not None:
+            self._callback(stats)
@@ -0,0 +1,142 @@
+"""Record a stream into a in-memory ring buffer for event clips."""
+import asyncio
+from collections import deque
+import logging
+from typing import Deque, List, Optional, Tuple
+
+from .fmp4 import HAFFmpegFmp4
+from .timeout import asyncio_timeout
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """Write a clip to a file."""
+    with open(path, "wb") as clip:
+        clip.write(data)
+
+
+class EventRecorder(HAFFmpegFmp4):
+    """Keep the last seconds of a stream in memory without re-encoding.
+
+    FFmpeg copy the video into a fragmented MP4, every fragment start
+    with a key frame. Fragments are kept for pre_time seconds and limited
+    by max_bytes. A clip is the init segment with the fragments of the
+    seconds before and after a event.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        pre_time: float = 10,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        """Init event recorder."""
+        super().__init__(ffmpeg_bin)
+
+        self._pre_time = pre_time
+        self._max_bytes = max_bytes
+        self._init: Optional[bytes] = None
+        self._fragments: Deque[Tuple[float, bytes]] = deque()
+        self._bytes = 0
+        self._listeners: List[List[bytes]] = []
+        self._new_fragment = asyncio.Event()
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Return the size of the buffered fragments."""
+        return self._bytes
+
+    @property
+    def buffered_time(self) -> float:
+        """Return the seconds of the buffered fragments."""
+        if not self._fragments:
+            return 0
+        return self._loop.time() - self._fragments[0][0]
+
+    async def open_recorder(
+        self,
+        input_source: str,
+        extra_cmd: Optional[str] = None,
+        audio: bool = False,
+    ) -> bool:
+        """Open FFmpeg process and record the stream into the buffer."""
+        return await self.open_fmp4(input_source, extra_cmd, audio)
+
+    async def close(self, timeout: int = 5) -> None:
+        """Stop the recording and clear the buffer."""
+        await super().close(timeout)
+        self._init = None
+        self._fragments.clear()
+        self._bytes = 0
+
+    async def get_clip(
+        self, before: float = 10, after: float = 0, timeout: float = 10
+    ) -> Optional[bytes]:
+        """Return a MP4 clip of before seconds buffer and after seconds.
+
+        The clip start with the first fragment they end inside of before
+        seconds, so it contain up to a key frame interval more. A fragment
+        is written with the next key frame, the clip wait up to timeout
+        seconds for the running fragment they contain the end.
+        """
+        if self._init is None:
+            _LOGGER.warning("No init segment recorded")
+            return None
+
+        init = self._init
+        cutoff = self._loop.time() - before
+        fragments = [data for received, data in self._fragments if received > cutoff]
+
+        listener: List[bytes] = []
+        self._listeners.append(listener)
+        try:
+            if after > 0:
+                await asyncio.sleep(after)
+            await self._wait_fragment(listener, timeout)
+        finally:
+            self._listeners.remove(listener)
+        fragments.extend(listener)
+
+        return b"".join([init, *fragments])
+
+    async def _wait_fragment(self, listener: List[bytes], timeout: float) -> None:
+        """Wait for the next fragment."""
+        received = len(listener)
+        try:
+            async with asyncio_timeout(timeout):
+                while len(listener) == received:
+                    await self._new_fragment.wait()
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Timeout while waiting of the running fragment")
+
+    async def save_clip(
+        self, path: str, before: float = 10, after: float = 0, timeout: float = 10
+    ) -> bool:
+        """Write a clip to a file, the file is written in the executor."""
+        clip = await self.get_clip(before, after, timeout)
+        if clip is None:
+            return False
+        await self._loop.run_in_executor(None, _write_file, path, clip)
+        return True
+
+    def _init_received(self, init: Optional[bytes]) -> None:
+        """Keep the init segment for the clips."""
+        self._init = init
+
+    def _fragment_received(self, fragment: bytes) -> None:
+        """Add a fragment and drop the old ones."""
+        now = self._loop.time()
+        self._fragments.append((now, fragment))
+        self._bytes += len(fragment)
+        for listener in self._listeners:
+            listener.append(fragment)
+        self._new_fragment.set()
+        self._new_fragment = asyncio.Event()
+
+        # keep at least the newest fragment
+        cutoff = now - self._pre_time
+        while len(self._fragments) > 1 and (
+            self._fragments[0][0] <= cutoff or self._bytes > self._max_bytes
+        ):
+            self._bytes -= len(self._fragments.popleft()[1])
@@ -1,30 +1,138 @@
 """For HA sensor components."""
 import asyncio
+from dataclasses import dataclass
+from functools import partial
 import logging
-import re
-from time import time
-from typing import Callable, Coroutine, Optional
+from typing import Callable, Coroutine, Hashable, List, Optional
 
-from .core import FFMPEG_STDOUT, HAFFmpegWorker
-from .timeout import asyncio_timeout
+from .core import FFMPEG_STDOUT, HAFFmpeg, HAFFmpegProtocolWorker, HAFFmpegWorker
+from .state import MotionDetector, NoiseDetector, TimerService, TimerWheel
 
 _LOGGER = logging.getLogger(__name__)
 
 
+# silencedetect can't change the noise level at runtime, a gain in front
+# of it move the level without restart
+NOISE_GAIN = "volume@haffmpeg_gain"
+
+
+def _noise_filter(peak: int) -> str:
+    """Return the silencedetect filter of the noise sensor."""
+    return f"{NOISE_GAIN}=volume=0dB:precision=float,silencedetect=n={peak}dB:d=1"
+
+
+def _send_noise_peak(ffmpeg: HAFFmpeg, open_peak: int, peak: int) -> bool:
+    """Move the noise level of a running silencedetect to peak."""
+    return ffmpeg.send_command(NOISE_GAIN, "volume", f"{open_peak - peak}dB")
+
+
+@dataclass(frozen=True)
+class MotionDecode:
+    """Decode settings of the motion detection to reduce CPU usage.
+
+    keyframes decode only key frames, fps drop frames, width scale down
+    and gray drop the color before the scene detection. The scene score
+    compare a frame with the previous selected frame, with less frames
+    the same motion give higher scores.
+    """
+
+    keyframes: bool = False
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    gray: bool = False
+
+    @property
+    def input_cmd(self) -> List[str]:
+        """Return the decoder options of the input."""
+        if self.keyframes:
+            return ["-skip_frame", "nokey"]
+        return []
+
+    @property
+    def filters(self) -> List[str]:
+        """Return the filters in front of the scene detection."""
+        filters = []
+        if self.fps is not None:
+            filters.append(f"fps={self.fps}")
+        if self.width is not None:
+            filters.append(f"scale={self.width}:-2:flags=fast_bilinear")
+        if self.gray:
+            filters.append("format=gray")
+        return filters
+
+
+# full decode
+MOTION_DECODE_FULL = MotionDecode()
+# 2 frames per second in 320 pixel gray
+MOTION_DECODE_LOW_CPU = MotionDecode(fps=2, width=320, gray=True)
+# only key frames in 320 pixel gray
+MOTION_DECODE_KEYFRAMES = MotionDecode(keyframes=True, width=320, gray=True)
+
+
+# metadata filter print the score of every frame to stdout
+SCENE_SCORE_FILTER = (
+    "select=gte(scene\\,0),"
+    "metadata=mode=print:key=lavfi.scene_score:file=-:direct=1"
+)
+SCENE_SCORE_MATCH = r"lavfi\.scene_score="
+
+
+def _motion_filter(
+    changes: float, decode: MotionDecode = MOTION_DECODE_FULL, scores: bool = False
+) -> str:
+    """Return the scene select filter of the motion sensor."""
+    if scores:
+        select = SCENE_SCORE_FILTER
+    else:
+        select = f"select=gt(scene\\,{changes / 100})"
+    return ",".join([*decode.filters, select])
+
+
+def _motion_output(scores: bool) -> str:
+    """Return the output of the motion sensor."""
+    return "-f null -" if scores else "-f framemd5 -"
+
+
+def _scene_score(line: str) -> Optional[float]:
+    """Return the score of a lavfi.scene_score line."""
+    try:
+        return float(line.rpartition("=")[2])
+    except ValueError:
+        _LOGGER.warning("Unknown data from FFmpeg!")
+        return None
+
+
+def _noise_line(detector: NoiseDetector, line: str) -> None:
+    """Feed a silencedetect line into the noise state machine."""
+    if "silence_start" in line:
+        detector.silence_start()
+    elif "silence_end" in line:
+        detector.silence_end()
+    else:
+        _LOGGER.warning("Unknown data from FFmpeg!")
+
+
 class SensorNoise(HAFFmpegWorker):
     """Implement a noise detection on a autio stream."""
 
-    STATE_NONE = 0
-    STATE_NOISE = 1
-    STATE_END = 2
-    STATE_DETECT = 3
+    STATE_NONE = NoiseDetector.STATE_NONE
+    STATE_NOISE = NoiseDetector.STATE_NOISE
+    STATE_END = NoiseDetector.STATE_END
+    STATE_DETECT = NoiseDetector.STATE_DETECT
 
-    def __init__(self, ffmpeg_bin: str, callback: Callable):
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Callable,
+        timers: Optional[TimerService] = None,
+    ):
         """Init noise sensor."""
         super().__init__(ffmpeg_bin)
 
         self._callback = callback
+        self._timers = timers or TimerWheel.for_loop(self._loop)
         self._peak = -30
+        self._open_peak = -30
         self._time_duration = 1
         self._time_reset = 2
 
@@ -36,6 +144,11 @@ class SensorNoise(HAFFmpegWorker):
         self._time_reset = time_reset
         self._peak = peak
 
+    def set_peak(self, peak: int) -> bool:
+        """Set the noise level in dB, a running FFmpeg is updated live."""
+        self._peak = peak
+        return self.is_running and _send_noise_peak(self, self._open_peak, peak)
+
     def open_sensor(
         self,
         input_source: str,
@@ -46,7 +159,8 @@ class SensorNoise(HAFFmpegWorker):
 
         Return a coroutine.
         """
-        command = ["-vn", "-filter:a", f"silencedetect=n={self._peak}dB:d=1"]
+        self._open_peak = self._peak
+        command = ["-vn", "-filter:a", _noise_filter(self._peak)]
 
         # run ffmpeg, read output
         return self.start_worker(
@@ -59,94 +173,92 @@ class SensorNoise(HAFFmpegWorker):
 
     async def _worker_process(self) -> None:
         """This function processing data."""
-        state = self.STATE_DETECT
-        timeout = self._time_duration
-
-        self._loop.call_soon(self._callback, False)
-
-        re_start = re.compile("silence_start")
-        re_end = re.compile("silence_end")
+        detector = NoiseDetector(
+            partial(self._loop.call_soon, self._callback),
+            self._timers,
+            self._time_duration,
+            self._time_reset,
+        )
+        detector.start()
 
         # process queue data
-        while True:
-            try:
-                _LOGGER.debug("Reading State: %d, timeout: %s", state, timeout)
-                async with asyncio_timeout(timeout):
-                    data = await self._queue.get()
-                timeout = None
-                if data is None:
-                    self._loop.call_soon(self._callback, None)
-                    return
-            except asyncio.TimeoutError:
-                _LOGGER.debug("Blocking timeout")
-                # noise
-                if state == self.STATE_DETECT:
-                    # noise detected
-                    self._loop.call_soon(self._callback, True)
-                    state = self.STATE_NOISE
-
-                elif state == self.STATE_END:
-                    # no noise
-                    self._loop.call_soon(self._callback, False)
-                    state = self.STATE_NONE
-
-                timeout = None
-                continue
-
-            if re_start.search(data):
-                if state == self.STATE_NOISE:
-                    # stop noise detection
-                    state = self.STATE_END
-                    timeout = self._time_reset
-                elif state == self.STATE_DETECT:
-                    # reset if only a peak
-                    state = self.STATE_NONE
-                continue
-
-            if re_end.search(data):
-                if state == self.STATE_NONE:
-                    # detect noise begin
-                    state = self.STATE_DETECT
-                    timeout = self._time_duration
-                elif state == self.STATE_END:
-                    # back to noise status
-                    state = self.STATE_NOISE
-                continue
-
-            _LOGGER.warning("Unknown data from queue!")
+        try:
+            while (data := await self._queue.get()) is not None:
+                _LOGGER.debug("Reading State: %d", detector.state)
+                _noise_line(detector, data)
+        finally:
+            detector.stop()
 
 
 class SensorMotion(HAFFmpegWorker):
     """Implement motion detection with ffmpeg scene detection."""
 
-    STATE_NONE = 0
-    STATE_REPEAT = 1
-    STATE_MOTION = 2
+    STATE_NONE = MotionDetector.STATE_NONE
+    STATE_REPEAT = MotionDetector.STATE_REPEAT
+    STATE_MOTION = MotionDetector.STATE_MOTION
 
     MATCH = r"\d,.*\d,.*\d,.*\d,.*\d,.*\w"
 
-    def __init__(self, ffmpeg_bin: str, callback: Callable):
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Callable,
+        timers: Optional[TimerService] = None,
+    ):
         """Init motion sensor."""
         super().__init__(ffmpeg_bin)
 
         self._callback = callback
+        self._timers = timers or TimerWheel.for_loop(self._loop)
         self._changes = 10
+        self._decode = MOTION_DECODE_FULL
+        self._scene_scores = False
+        self._score: Optional[float] = None
         self._time_reset = 60
         self._time_repeat = 0
         self._repeat = 0
 
+    @property
+    def changes(self) -> float:
+        """Return the scene change threshold in percent."""
+        return self._changes
+
+    @changes.setter
+    def changes(self, changes: float) -> None:
+        """Set the threshold, in scene score mode without restart."""
+        self._changes = changes
+        if self.is_running and not self._scene_scores:
+            _LOGGER.info("Scene changes take effect with the next start")
+
+    @property
+    def scene_score(self) -> Optional[float]:
+        """Return the last scene score in scene score mode."""
+        return self._score
+
+    def _queue_key(self, line: str) -> Hashable:
+        """Coalesce framemd5 lines, every selected frame is the same motion."""
+        return line if self._scene_scores else None
+
     def set_options(
         self,
         time_reset: int = 60,
         time_repeat: int = 0,
         repeat: int = 0,
         changes: int = 10,
+        decode: MotionDecode = MOTION_DECODE_FULL,
+        scene_scores: bool = False,
     ) -> None:
-        """Set option parameter for noise sensor."""
+        """Set option parameter for noise sensor.
+
+        With scene_scores FFmpeg print the score of every frame and the
+        threshold is applied here, instead of hashing selected frames.
+        """
         self._time_reset = time_reset
         self._time_repeat = time_repeat
         self._repeat = repeat
         self._changes = changes
+        self._decode = decode
+        self._scene_scores = scene_scores
 
     async def open_sensor(
         self, input_source: str, extra_cmd: Optional[str] = None
@@ -158,87 +270,297 @@ class SensorMotion(HAFFmpegWorker):
         command = [
             "-an",
             "-filter:v",
-            f"select=gt(scene\\,{self._changes / 100})",
+            _motion_filter(self._changes, self._decode, self._scene_scores),
         ]
 
         # run ffmpeg, read output
         return await self.start_worker(
             cmd=command,
             input_source=input_source,
-            output="-f framemd5 -",
+            output=_motion_output(self._scene_scores),
             extra_cmd=extra_cmd,
-            pattern=self.MATCH,
+            pattern=SCENE_SCORE_MATCH if self._scene_scores else self.MATCH,
             reading=FFMPEG_STDOUT,
+            input_cmd=self._decode.input_cmd,
         )
 
     async def _worker_process(self) -> None:
         """This function processing data."""
-        state = self.STATE_NONE
-        timeout = None
+        detector = MotionDetector(
+            partial(self._loop.call_soon, self._callback),
+            self._timers,
+            self._time_reset,
+            self._time_repeat,
+            self._repeat,
+        )
+        detector.start()
+
+        # process queue data, the reader match only frame or score lines
+        try:
+            while (data := await self._queue.get()) is not None:
+                _LOGGER.debug("Reading State: %d", detector.state)
+                if self._scene_scores:
+                    self._score = _scene_score(data)
+                    if self._score is None or self._score <= self._changes / 100:
+                        continue
+                detector.motion()
+        finally:
+            detector.stop()
+
+
+class SensorNoiseMotion(HAFFmpegWorker):
+    """Implement noise and motion detection on one stream with one FFmpeg.
+
+    The input is read and demuxed once, audio is decoded for silencedetect
+    and video for the scene detection. Use the noise and motion members to
+    set options of the detections.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        noise_callback: Callable,
+        motion_callback: Callable,
+        timers: Optional[TimerService] = None,
+    ):
+        """Init noise and motion sensor."""
+        super().__init__(ffmpeg_bin)
+
+        self.noise = SensorNoise(ffmpeg_bin, noise_callback, timers)
+        self.motion = SensorMotion(ffmpeg_bin, motion_callback, timers)
+        self._motion_task = None
+
+    async def open_sensor(
+        self, input_source: str, extra_cmd: Optional[str] = None
+    ) -> None:
+        """Open FFmpeg process for a audio and video stream."""
+        if self.is_running:
+            _LOGGER.warning("Can't start sensor. It is allready running!")
+            return
+
+        # pylint: disable=protected-access
+        self.noise._open_peak = self.noise._peak
+        self.noise._apply_queue()
+        self.motion._apply_queue()
+        command = [
+            "-map",
+            "0:a:0",
+            "-filter:a:0",
+            _noise_filter(self.noise._peak),
+            "-f",
+            "null",
+            "-",
+            "-map",
+            "0:v:0",
+            "-filter:v",
+            _motion_filter(
+                self.motion._changes, self.motion._decode, self.motion._scene_scores
+            ),
+        ]
+
+        await self.open(
+            cmd=command,
+            input_source=input_source,
+            output=_motion_output(self.motion._scene_scores),
+            extra_cmd=extra_cmd,
+            stdout_pipe=True,
+            stderr_pipe=True,
+            input_cmd=self.motion._decode.input_cmd,
+        )
 
-        self._loop.call_soon(self._callback, False)
+        # silencedetect logs to stderr, framemd5 writes to stdout
+        self._read_task = self._loop.create_task(
+            self._process_lines("silence", self._proc.stderr, self.noise._queue)
+        )
+        self._motion_task = self._loop.create_task(
+            self._process_lines(
+                SCENE_SCORE_MATCH if self.motion._scene_scores else SensorMotion.MATCH,
+                self._proc.stdout,
+                self.motion._queue,
+            )
+        )
+        self._loop.create_task(self._worker_process())
 
-        # for repeat feature
-        re_frame = 0
-        re_time = 0
+    def set_peak(self, peak: int) -> bool:
+        """Set the noise level in dB, a running FFmpeg is updated live."""
+        # pylint: disable-next=protected-access
+        open_peak = self.noise._open_peak
+        self.noise.set_peak(peak)
+        return self.is_running and _send_noise_peak(self, open_peak, peak)
 
-        re_data = re.compile(self.MATCH)
+    async def close(self, timeout: int = 5) -> None:
+        """Stop the ffmpeg instance."""
+        if self._motion_task is not None and not self._motion_task.cancelled():
+            self._motion_task.cancel()
 
-        # process queue data
-        while True:
-            try:
-                _LOGGER.debug("Reading State: %d, timeout: %s", state, timeout)
-                async with asyncio_timeout(timeout):
-                    data = await self._queue.get()
-                if data is None:
-                    self._loop.call_soon(self._callback, None)
-                    return
-            except asyncio.TimeoutError:
-                _LOGGER.debug("Blocking timeout")
-                # reset motion detection
-                if state == self.STATE_MOTION:
-                    state = self.STATE_NONE
-                    self._loop.call_soon(self._callback, False)
-                    timeout = None
-                # reset repeate state
-                if state == self.STATE_REPEAT:
-                    state = self.STATE_NONE
-                    timeout = None
-                continue
-
-            frames = re_data.search(data)
-            if frames:
-                # repeat not used
-                if self._repeat == 0 and state == self.STATE_NONE:
-                    state = self.STATE_MOTION
-                    self._loop.call_soon(self._callback, True)
-                    timeout = self._time_reset
-
-                # repeat feature is on / first motion
-                if state == self.STATE_NONE:
-                    state = self.STATE_REPEAT
-                    timeout = self._time_repeat
-                    re_frame = 0
-                    re_time = time()
-
-                elif state == self.STATE_REPEAT:
-                    re_frame += 1
-
-                    # REPEAT ready?
-                    if re_frame >= self._repeat:
-                        state = self.STATE_MOTION
-                        self._loop.call_soon(self._callback, True)
-                        timeout = self._time_reset
-                    else:
-                        past = time() - re_time
-                        timeout -= past
-
-                    # REPEAT time down
-                    if timeout <= 0:
-                        _LOGGER.debug("Reset repeat to none")
-                        state = self.STATE_NONE
-                        timeout = None
-
-                continue
-
-            _LOGGER.warning("Unknown data from queue!")
+        return await super().close(timeout)
+
+    async def _worker_process(self) -> None:
+        """Run the noise and motion state machines."""
+        # pylint: disable-next=protected-access
+        await asyncio.gather(self.noise._worker_process(), self.motion._worker_process())
+
+
+class SensorNoiseProtocol(HAFFmpegProtocolWorker):
+    """Implement a noise detection inside the subprocess protocol.
+
+    Same options and callbacks as SensorNoise without reader and worker
+    tasks, queue and timeout contexts.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Callable,
+        timers: Optional[TimerService] = None,
+    ):
+        """Init noise sensor."""
+        super().__init__(ffmpeg_bin)
+
+        self._peak = -30
+        self._open_peak = -30
+        self._detector = NoiseDetector(
+            partial(self._loop.call_soon, callback),
+            timers or TimerWheel.for_loop(self._loop),
+        )
+
+    def set_options(
+        self, time_duration: int = 1, time_reset: int = 2, peak: int = -30
+    ) -> None:
+        """Set option parameter for noise sensor."""
+        self._detector.time_duration = time_duration
+        self._detector.time_reset = time_reset
+        self._peak = peak
+
+    def set_peak(self, peak: int) -> bool:
+        """Set the noise level in dB, a running FFmpeg is updated live."""
+        self._peak = peak
+        return self.is_running and _send_noise_peak(self, self._open_peak, peak)
+
+    def open_sensor(
+        self,
+        input_source: str,
+        output_dest: Optional[str] = None,
+        extra_cmd: Optional[str] = None,
+    ) -> Coroutine:
+        """Open FFmpeg process for read autio stream.
+
+        Return a coroutine.
+        """
+        self._open_peak = self._peak
+        return self.start_worker(
+            cmd=["-vn", "-filter:a", _noise_filter(self._peak)],
+            input_source=input_source,
+            output=output_dest,
+            extra_cmd=extra_cmd,
+            pattern="silence",
+        )
+
+    def _worker_started(self) -> None:
+        """Start noise detection."""
+        self._detector.start()
+
+    def _worker_stopped(self) -> None:
+        """Stop noise detection."""
+        self._detector.stop()
+
+    def _line_received(self, line: str) -> None:
+        """Process silencedetect output."""
+        _noise_line(self._detector, line)
+
+
+class SensorMotionProtocol(HAFFmpegProtocolWorker):
+    """Implement motion detection inside the subprocess protocol.
+
+    Same options and callbacks as SensorMotion without reader and worker
+    tasks, queue and timeout contexts.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        callback: Callable,
+        timers: Optional[TimerService] = None,
+    ):
+        """Init motion sensor."""
+        super().__init__(ffmpeg_bin)
+
+        self._changes = 10
+        self._decode = MOTION_DECODE_FULL
+        self._scene_scores = False
+        self._score: Optional[float] = None
+        self._detector = MotionDetector(
+            partial(self._loop.call_soon, callback),
+            timers or TimerWheel.for_loop(self._loop),
+        )
+
+    @property
+    def changes(self) -> float:
+        """Return the scene change threshold in percent."""
+        return self._changes
+
+    @changes.setter
+    def changes(self, changes: float) -> None:
+        """Set the threshold, in scene score mode without restart."""
+        self._changes = changes
+        if self.is_running and not self._scene_scores:
+            _LOGGER.info("Scene changes take effect with the next start")
+
+    @property
+    def scene_score(self) -> Optional[float]:
+        """Return the last scene score in scene score mode."""
+        return self._score
+
+    def set_options(
+        self,
+        time_reset: int = 60,
+        time_repeat: int = 0,
+        repeat: int = 0,
+        changes: int = 10,
+        decode: MotionDecode = MOTION_DECODE_FULL,
+        scene_scores: bool = False,
+    ) -> None:
+        """Set option parameter for motion sensor."""
+        self._detector.time_reset = time_reset
+        self._detector.time_repeat = time_repeat
+        self._detector.repeat = repeat
+        self._changes = changes
+        self._decode = decode
+        self._scene_scores = scene_scores
+
+    def open_sensor(
+        self, input_source: str, extra_cmd: Optional[str] = None
+    ) -> Coroutine:
+        """Open FFmpeg process a video stream for motion detection.
+
+        Return a coroutine.
+        """
+        return self.start_worker(
+            cmd=[
+                "-an",
+                "-filter:v",
+                _motion_filter(self._changes, self._decode, self._scene_scores),
+            ],
+            input_source=input_source,
+            output=_motion_output(self._scene_scores),
+            extra_cmd=extra_cmd,
+            pattern=SCENE_SCORE_MATCH if self._scene_scores else SensorMotion.MATCH,
+            reading=FFMPEG_STDOUT,
+            input_cmd=self._decode.input_cmd,
+        )
+
+    def _worker_started(self) -> None:
+        """Start motion detection."""
+        self._detector.start()
+
+    def _worker_stopped(self) -> None:
+        """Stop motion detection."""
+        self._detector.stop()
+
+    def _line_received(self, line: str) -> None:
+        """Process a selected frame or a scene score."""
+        if self._scene_scores:
+            self._score = _scene_score(line)
+            if self._score is None or self._score <= self._changes / 100:
+                return
+        self._detector.motion()
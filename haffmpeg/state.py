@@ -0,0 +1,427 @@
+"""State machines for HA sensor components.
+
+The state machines don't know about asyncio or wall clock time. Timeouts
+are scheduled through a timer service, a shared TimerWheel of the event
+loop, LoopTimers or ManualTimers to replay events faster than realtime.
+"""
+import asyncio
+import heapq
+from itertools import count
+import logging
+import math
+from typing import Callable, List, Optional, Tuple
+import weakref
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TimerService:
+    """Schedule callbacks on a clock."""
+
+    def time(self) -> float:
+        """Return the current time of the clock."""
+        raise NotImplementedError()
+
+    def call_at(self, when: float, callback: Callable[[], None]):
+        """Call callback at time when, return a handle with cancel and when."""
+        raise NotImplementedError()
+
+
+class LoopTimers(TimerService):
+    """Timers with one loop.call_at handle per timer."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        """Init loop timers."""
+        self._loop = loop
+
+    def time(self) -> float:
+        """Return the loop time."""
+        return self._loop.time()
+
+    def call_at(self, when: float, callback: Callable[[], None]):
+        """Schedule callback on the loop."""
+        return self._loop.call_at(when, callback)
+
+
+class _WheelTimer:
+    """Handle of a timer in a TimerWheel."""
+
+    __slots__ = ("_wheel", "_when", "tick", "callback", "cancelled")
+
+    def __init__(self, wheel: "TimerWheel", when: float, tick: int, callback):
+        """Init wheel timer."""
+        self._wheel = wheel
+        self._when = when
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    def when(self) -> float:
+        """Return the scheduled time."""
+        return self._when
+
+    def cancel(self) -> None:
+        """Cancel the timer."""
+        if not self.cancelled:
+            self.cancelled = True
+            self._wheel.discard()
+
+
+class TimerWheel(TimerService):
+    """Hashed timer wheel they share one loop handle between all timers.
+
+    Timers fire on the first tick after their time, at most resolution
+    seconds late. Without a loop, call advance to run due timers.
+    """
+
+    _wheels: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimerWheel]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(
+        self,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        clock: Optional[Callable[[], float]] = None,
+        resolution: float = 0.05,
+        slots: int = 512,
+    ):
+        """Init timer wheel."""
+        # the loop is the key of the shared wheels, don't keep it alive
+        self._loop_ref = None if loop is None else weakref.ref(loop)
+        self._clock = clock or self._loop_time
+        self._resolution = resolution
+        self._slots: List[List[_WheelTimer]] = [[] for _ in range(slots)]
+        self._tick = math.floor(self._clock() / resolution)
+        self._timers = 0
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def _loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """Return the loop or None."""
+        return None if self._loop_ref is None else self._loop_ref()
+
+    def _loop_time(self) -> float:
+        """Return the time of the loop."""
+        return self._loop_ref().time()
+
+    @classmethod
+    def for_loop(cls, loop: asyncio.AbstractEventLoop) -> "TimerWheel":
+        """Return the shared timer wheel of a event loop."""
+        wheel = cls._wheels.get(loop)
+        if wheel is None:
+            wheel = cls._wheels[loop] = cls(loop)
+        return wheel
+
+    def __len__(self) -> int:
+        """Return the number of scheduled timers."""
+        return self._timers
+
+    def time(self) -> float:
+        """Return the current time of the clock."""
+        return self._clock()
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> _WheelTimer:
+        """Call callback on the first tick after when."""
+        tick = max(math.ceil(when / self._resolution), self._tick + 1)
+        timer = _WheelTimer(self, when, tick, callback)
+        self._slots[tick % len(self._slots)].append(timer)
+        self._timers += 1
+
+        if self._loop is not None and self._handle is None:
+            self._schedule()
+        return timer
+
+    def discard(self) -> None:
+        """Account a canceled timer, it is removed on its tick."""
+        self._timers -= 1
+
+    def advance(self) -> None:
+        """Run all timers they are due on the clock."""
+        target = math.floor(self._clock() / self._resolution)
+        if target <= self._tick:
+            return
+
+        # visit every slot once if the wheel turned more than one round
+        ticks = range(self._tick + 1, target + 1)
+        if len(ticks) > len(self._slots):
+            ticks = range(target - len(self._slots) + 1, target + 1)
+        self._tick = target
+
+        due: List[_WheelTimer] = []
+        for tick in ticks:
+            slot = self._slots[tick % len(self._slots)]
+            if not slot:
+                continue
+            keep = []
+            for timer in slot:
+                if timer.cancelled:
+                    continue
+                if timer.tick <= target:
+                    due.append(timer)
+                else:
+                    keep.append(timer)
+            slot[:] = keep
+
+        due.sort(key=lambda timer: timer.tick)
+        for timer in due:
+            if timer.cancelled:
+                continue
+            timer.cancelled = True
+            self._timers -= 1
+            try:
+                timer.callback()
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in timer callback")
+
+    def _schedule(self) -> None:
+        """Tick on the loop while timers are scheduled."""
+        loop = self._loop
+        if loop is not None:
+            self._handle = loop.call_at(
+                (self._tick + 1) * self._resolution, self._on_tick
+            )
+
+    def _on_tick(self) -> None:
+        """Run due timers and schedule the next tick."""
+        # keep the handle while timers run, a call_at of a callback would
+        # start a second tick chain
+        self.advance()
+        self._handle = None
+        if self._timers > 0:
+            self._schedule()
+
+
+class ManualTimers(TimerService):
+    """Timers on a manual clock to replay events faster than realtime."""
+
+    def __init__(self, start: float = 0):
+        """Init manual timers."""
+        self._now = start
+        self._queue: List[Tuple[float, int, "_ManualTimer"]] = []
+        self._counter = count()
+
+    def time(self) -> float:
+        """Return the manual time."""
+        return self._now
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> "_ManualTimer":
+        """Call callback if the clock reach when."""
+        timer = _ManualTimer(when, callback)
+        heapq.heappush(self._queue, (when, next(self._counter), timer))
+        return timer
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock and run the due timers in order."""
+        target = self._now + seconds
+        while self._queue and self._queue[0][0] <= target:
+            when, _, timer = heapq.heappop(self._queue)
+            if timer.cancelled:
+                continue
+            self._now = max(self._now, when)
+            timer.callback()
+        self._now = target
+
+
+class _ManualTimer:
+    """Handle of a timer in ManualTimers."""
+
+    __slots__ = ("_when", "callback", "cancelled")
+
+    def __init__(self, when: float, callback: Callable[[], None]):
+        """Init manual timer."""
+        self._when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def when(self) -> float:
+        """Return the scheduled time."""
+        return self._when
+
+    def cancel(self) -> None:
+        """Cancel the timer."""
+        self.cancelled = True
+
+
+class _Timer:
+    """Single timer of a state machine.
+
+    Moving the deadline to a later time keeps the scheduled handle, the
+    new deadline is applied when the handle fires.
+    """
+
+    def __init__(self, timers: TimerService, callback: Callable[[], None]):
+        """Init timer."""
+        self._timers = timers
+        self._callback = callback
+        self._deadline: Optional[float] = None
+        self._handle = None
+
+    def set(self, delay: Optional[float]) -> None:
+        """Fire the callback after delay seconds, None stop the timer."""
+        if delay is None:
+            self._deadline = None
+            return
+
+        self._deadline = self._timers.time() + delay
+        if self._handle is None or self._handle.when() > self._deadline:
+            if self._handle is not None:
+                self._handle.cancel()
+            self._handle = self._timers.call_at(self._deadline, self._fire)
+
+    def cancel(self) -> None:
+        """Stop the timer and release the handle."""
+        self._deadline = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _fire(self) -> None:
+        """Run the callback or wait for a moved deadline."""
+        self._handle = None
+        if self._deadline is None:
+            return
+
+        if self._timers.time() < self._deadline:
+            self._handle = self._timers.call_at(self._deadline, self._fire)
+            return
+
+        self._deadline = None
+        self._callback()
+
+
+class NoiseDetector:
+    """Noise state machine for silencedetect events."""
+
+    STATE_NONE = 0
+    STATE_NOISE = 1
+    STATE_END = 2
+    STATE_DETECT = 3
+
+    def __init__(
+        self,
+        callback: Callable[[Optional[bool]], None],
+        timers: TimerService,
+        time_duration: float = 1,
+        time_reset: float = 2,
+    ):
+        """Init noise state machine."""
+        self._callback = callback
+        self._timer = _Timer(timers, self._timeout)
+        self.time_duration = time_duration
+        self.time_reset = time_reset
+        self.state = self.STATE_NONE
+
+    def start(self) -> None:
+        """Start detection, noise is reported after time_duration."""
+        self.state = self.STATE_DETECT
+        self._timer.set(self.time_duration)
+        self._callback(False)
+
+    def stop(self) -> None:
+        """Stop detection and report the end of the stream."""
+        self._timer.cancel()
+        self._callback(None)
+
+    def silence_start(self) -> None:
+        """Process a silence_start event."""
+        self._timer.set(None)
+        if self.state == self.STATE_NOISE:
+            # stop noise detection
+            self.state = self.STATE_END
+            self._timer.set(self.time_reset)
+        elif self.state == self.STATE_DETECT:
+            # reset if only a peak
+            self.state = self.STATE_NONE
+
+    def silence_end(self) -> None:
+        """Process a silence_end event."""
+        self._timer.set(None)
+        if self.state == self.STATE_NONE:
+            # detect noise begin
+            self.state = self.STATE_DETECT
+            self._timer.set(self.time_duration)
+        elif self.state == self.STATE_END:
+            # back to noise status
+            self.state = self.STATE_NOISE
+
+    def _timeout(self) -> None:
+        """Process the timeout of the current state."""
+        _LOGGER.debug("Noise timeout in state %d", self.state)
+        if self.state == self.STATE_DETECT:
+            # noise detected
+            self.state = self.STATE_NOISE
+            self._callback(True)
+        elif self.state == self.STATE_END:
+            # no noise
+            self.state = self.STATE_NONE
+            self._callback(False)
+
+
+class MotionDetector:
+    """Motion state machine for detected scene changes."""
+
+    STATE_NONE = 0
+    STATE_REPEAT = 1
+    STATE_MOTION = 2
+
+    def __init__(
+        self,
+        callback: Callable[[Optional[bool]], None],
+        timers: TimerService,
+        time_reset: float = 60,
+        time_repeat: float = 0,
+        repeat: int = 0,
+    ):
+        """Init motion state machine."""
+        self._callback = callback
+        self._timer = _Timer(timers, self._timeout)
+        self.time_reset = time_reset
+        self.time_repeat = time_repeat
+        self.repeat = repeat
+        self.state = self.STATE_NONE
+        self._repeat_frames = 0
+
+    def start(self) -> None:
+        """Start detection."""
+        self.state = self.STATE_NONE
+        self._callback(False)
+
+    def stop(self) -> None:
+        """Stop detection and report the end of the stream."""
+        self._timer.cancel()
+        self._callback(None)
+
+    def motion(self) -> None:
+        """Process a detected scene change."""
+        if self.state == self.STATE_MOTION:
+            # motion is going on
+            self._timer.set(self.time_reset)
+
+        elif self.state == self.STATE_NONE and self.repeat == 0:
+            self.state = self.STATE_MOTION
+            self._callback(True)
+            self._timer.set(self.time_reset)
+
+        elif self.state == self.STATE_NONE:
+            # repeat feature is on / first motion
+            self.state = self.STATE_REPEAT
+            self._repeat_frames = 0
+            self._timer.set(self.time_repeat)
+
+        else:
+            self._repeat_frames += 1
+            if self._repeat_frames >= self.repeat:
+                self.state = self.STATE_MOTION
+                self._callback(True)
+                self._timer.set(self.time_reset)
+
+    def _timeout(self) -> None:
+        """Process the timeout of the current state."""
+        _LOGGER.debug("Motion timeout in state %d", self.state)
+        if self.state == self.STATE_MOTION:
+            # reset motion detection
+            self.state = self.STATE_NONE
+            self._callback(False)
+        elif self.state == self.STATE_REPEAT:
+            # repeat time down
+            self.state = self.STATE_NONE
@@ -0,0 +1,161 @@
+"""Supervise many FFmpeg instances."""
+import asyncio
+from dataclasses import dataclass
+import logging
+import random
+from typing import Awaitable, Callable, Dict, Optional
+
+from .core import HAFFmpeg
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class SupervisedStats:
+    """Restart statistics of a supervised FFmpeg instance."""
+
+    starts: int = 0
+    restarts: int = 0
+    failures: int = 0
+    returncode: Optional[int] = None
+    running: bool = False
+    backoff: float = 0.0
+
+
+class _Supervised:
+    """A FFmpeg instance with its start coroutine."""
+
+    def __init__(self, ffmpeg: HAFFmpeg, start: Callable[[], Awaitable]):
+        """Init supervised instance."""
+        self.ffmpeg = ffmpeg
+        self.start = start
+        self.stats = SupervisedStats()
+        self.task: Optional[asyncio.Task] = None
+
+
+class FFmpegSupervisor:
+    """Start, watch and restart many FFmpeg instances.
+
+    Spawns are throttled, a new process counts as spawning until it run for
+    spawn_settle seconds. Crashed processes are restarted with a jittered
+    exponential backoff, a process they run longer as stable_time reset the
+    backoff. The number of running processes can be limited.
+    """
+
+    def __init__(
+        self,
+        max_spawns: int = 4,
+        max_processes: Optional[int] = None,
+        spawn_settle: float = 1,
+        backoff_min: float = 1,
+        backoff_max: float = 300,
+        stable_time: float = 60,
+    ):
+        """Init supervisor."""
+        self._spawns = asyncio.Semaphore(max_spawns)
+        self._processes = (
+            asyncio.Semaphore(max_processes) if max_processes is not None else None
+        )
+        self._spawn_settle = spawn_settle
+        self._backoff_min = backoff_min
+        self._backoff_max = backoff_max
+        self._stable_time = stable_time
+        self._instances: Dict[str, _Supervised] = {}
+
+    @property
+    def stats(self) -> Dict[str, SupervisedStats]:
+        """Return statistics of all instances."""
+        return {name: sup.stats for name, sup in self._instances.items()}
+
+    def restarts(self, name: str) -> int:
+        """Return the restart count of a instance."""
+        return self._instances[name].stats.restarts
+
+    def add(
+        self, name: str, ffmpeg: HAFFmpeg, start: Callable[[], Awaitable]
+    ) -> None:
+        """Supervise a FFmpeg instance.
+
+        Start is called to (re)start the instance, like
+        lambda: sensor.open_sensor(input_source)
+        """
+        if name in self._instances:
+            raise ValueError(f"FFmpeg instance {name} is already supervised")
+
+        supervised = _Supervised(ffmpeg, start)
+        supervised.task = asyncio.create_task(self._supervise(name, supervised))
+        self._instances[name] = supervised
+
+    async def remove(self, name: str, timeout: int = 5) -> None:
+        """Stop supervising and close a FFmpeg instance."""
+        supervised = self._instances.pop(name, None)
+        if supervised is None:
+            return
+
+        supervised.task.cancel()
+        await supervised.ffmpeg.close(timeout)
+        supervised.stats.running = False
+
+    async def close(self, timeout: int = 5) -> None:
+        """Stop all FFmpeg instances."""
+        await asyncio.gather(
+            *(self.remove(name, timeout) for name in list(self._instances))
+        )
+
+    async def _supervise(self, name: str, supervised: _Supervised) -> None:
+        """Run a instance and restart it after it ended."""
+        loop = asyncio.get_running_loop()
+        stats = supervised.stats
+
+        while True:
+            if self._processes is not None:
+                await self._processes.acquire()
+            try:
+                started = loop.time()
+                await self._spawn(supervised)
+
+                if supervised.ffmpeg.is_running:
+                    stats.running = True
+                    stats.returncode = await supervised.ffmpeg.process.wait()
+                    stats.running = False
+            finally:
+                if self._processes is not None:
+                    self._processes.release()
+
+            # a stable run resets the backoff
+            if loop.time() - started >= self._stable_time:
+                stats.failures = 0
+
+            stats.backoff = min(
+                self._backoff_max, self._backoff_min * 2**stats.failures
+            ) * random.uniform(0.5, 1)
+            stats.failures += 1
+            stats.restarts += 1
+
+            _LOGGER.warning(
+                "FFmpeg %s ended with %s, restart in %.1f seconds",
+                name,
+                stats.returncode,
+                stats.backoff,
+            )
+            await asyncio.sleep(stats.backoff)
+
+    async def _spawn(self, supervised: _Supervised) -> None:
+        """Start a instance with a limited number of concurrent spawns."""
+        async with self._spawns:
+            supervised.stats.starts += 1
+            try:
+                await supervised.start()
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error starting FFmpeg")
+            if not supervised.ffmpeg.is_running:
+                return
+
+            # keep the spawn slot while FFmpeg is connecting
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(supervised.ffmpeg.process.wait()),
+                    self._spawn_settle,
+                )
+            except asyncio.TimeoutError:
+                pass
@@ -1,9 +1,15 @@
 """For HA varios tools."""
 import asyncio
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
+import json
 import logging
+import os
 import re
-from typing import Optional
+import shutil
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
+from .camera import MjpegFrameReader
 from .core import HAFFmpeg
 from .timeout import asyncio_timeout
 
@@ -55,6 +61,220 @@ class ImageFrame(HAFFmpeg):
             await self.close(0)
 
 
+class SnapshotService:
+    """Share ImageFrame captures between callers and cache them.
+
+    Concurrent requests for the same input source, output format and extra
+    command are served by a single FFmpeg run. Results are cached for ttl
+    seconds, the cache is limited by entries and bytes with LRU eviction.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_bin: str,
+        ttl: float = 2,
+        max_entries: int = 32,
+        max_bytes: int = 16 * 1024 * 1024,
+    ):
+        """Init snapshot service."""
+        self._ffmpeg = ffmpeg_bin
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._cache: "OrderedDict[Tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._pending: Dict[Tuple, asyncio.Task] = {}
+
+    @property
+    def cache_bytes(self) -> int:
+        """Return the size of all cached images."""
+        return self._cache_bytes
+
+    async def get_image(
+        self,
+        input_source: str,
+        output_format: str = IMAGE_JPEG,
+        extra_cmd: Optional[str] = None,
+        timeout: int = 15,
+    ) -> Optional[bytes]:
+        """Return a cached image or capture a new one with FFmpeg."""
+        loop = asyncio.get_running_loop()
+        key = (input_source, output_format, extra_cmd)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > loop.time():
+                self._cache.move_to_end(key)
+                return cached[1]
+            self._remove(key)
+
+        task = self._pending.get(key)
+        if task is None:
+            task = loop.create_task(self._capture(key, timeout))
+            self._pending[key] = task
+
+        # a canceled caller must not cancel the capture of the others
+        return await asyncio.shield(task)
+
+    def invalidate(self, input_source: Optional[str] = None) -> None:
+        """Remove cached images of a input source or all."""
+        for key in list(self._cache):
+            if input_source is None or key[0] == input_source:
+                self._remove(key)
+
+    async def _capture(self, key: Tuple, timeout: int) -> Optional[bytes]:
+        """Run FFmpeg for a cache key and store the result."""
+        try:
+            image = await ImageFrame(self._ffmpeg).get_image(
+                input_source=key[0],
+                output_format=key[1],
+                extra_cmd=key[2],
+                timeout=timeout,
+            )
+        finally:
+            del self._pending[key]
+
+        if image is not None and self._ttl > 0:
+            self._store(key, image)
+        return image
+
+    def _store(self, key: Tuple, image: bytes) -> None:
+        """Put a image to cache and evict least recently used images."""
+        if len(image) > self._max_bytes:
+            return
+
+        self._remove(key)
+        self._cache[key] = (asyncio.get_running_loop().time() + self._ttl, image)
+        self._cache_bytes += len(image)
+
+        while (
+            len(self._cache) > self._max_entries or self._cache_bytes > self._max_bytes
+        ):
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def _remove(self, key: Tuple) -> None:
+        """Remove a image from cache."""
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cache_bytes -= len(cached[1])
+
+
+class LiveImageFrame(HAFFmpeg):
+    """Keep FFmpeg running and return the latest image of a stream.
+
+    The stream is decoded with a low frame rate and only the newest image is
+    kept in memory. FFmpeg is closed if no image was requested for
+    idle_timeout seconds and started again with the next request.
+    """
+
+    def __init__(self, ffmpeg_bin: str, fps: float = 1, idle_timeout: float = 60):
+        """Init live image frame."""
+        super().__init__(ffmpeg_bin)
+
+        self._fps = fps
+        self._idle_timeout = idle_timeout
+        self._source: Optional[Tuple] = None
+        self._image: Optional[bytes] = None
+        self._image_event = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._last_request = 0.0
+        self._read_task: Optional[asyncio.Task] = None
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+        self._idle_task: Optional[asyncio.Task] = None
+
+    async def get_image(
+        self,
+        input_source: str,
+        output_format: str = IMAGE_JPEG,
+        extra_cmd: Optional[str] = None,
+        timeout: int = 15,
+    ) -> Optional[bytes]:
+        """Return the latest image and start FFmpeg if needed."""
+        self._last_request = self._loop.time()
+        source = (input_source, output_format, extra_cmd)
+
+        async with self._lock:
+            idle_closing = self._idle_task is not None and not self._idle_task.done()
+            if source != self._source or not self.is_running or idle_closing:
+                if not await self._start(source):
+                    _LOGGER.warning("Error starting FFmpeg.")
+                    return None
+
+        # wait for the first image
+        try:
+            async with asyncio_timeout(timeout):
+                await self._image_event.wait()
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Timeout reading image.")
+            return None
+
+        return self._image
+
+    async def close(self, timeout=5) -> None:
+        """Stop the ffmpeg instance."""
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        # a pending idle close would clear the process of a new start
+        idle_task = self._idle_task
+        if idle_task is not None and idle_task is not asyncio.current_task():
+            self._idle_task = None
+            await idle_task
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+
+        await super().close(timeout)
+
+    async def _start(self, source: Tuple) -> bool:
+        """Start FFmpeg for a new source."""
+        await self.close()
+
+        self._source = source
+        self._image = None
+        self._image_event.clear()
+
+        input_source, output_format, extra_cmd = source
+        command = ["-an", "-filter:v", f"fps={self._fps}", "-c:v", output_format]
+
+        is_open = await self.open(
+            cmd=command,
+            input_source=input_source,
+            output="-f mpjpeg -",
+            extra_cmd=extra_cmd,
+        )
+        if not is_open:
+            return False
+
+        self._read_task = self._loop.create_task(self._read_images())
+        self._idle_handle = self._loop.call_later(self._idle_timeout, self._idle)
+        return True
+
+    async def _read_images(self) -> None:
+        """Keep the latest image of the stream."""
+        async for frame in MjpegFrameReader(self._proc.stdout):
+            self._image = bytes(frame)
+            self._image_event.set()
+
+        # wake up waiting requests
+        _LOGGER.debug("Image stream ended")
+        self._image_event.set()
+
+    def _idle(self) -> None:
+        """Close FFmpeg if no image was requested for a while."""
+        idle = self._loop.time() - self._last_request
+        if idle < self._idle_timeout:
+            self._idle_handle = self._loop.call_later(
+                self._idle_timeout - idle, self._idle
+            )
+            return
+
+        _LOGGER.debug("Close idle FFmpeg after %.0f seconds", idle)
+        self._idle_handle = None
+        self._idle_task = self._loop.create_task(self.close())
+
+
 class FFVersion(HAFFmpeg):
     """Retrieve FFmpeg version information."""
 
@@ -63,24 +283,29 @@ class FFVersion(HAFFmpeg):
 
         Return full FFmpeg version string. Such as 3.4.2-tessus
         """
-        command = ["-version"]
-        # open input for capture 1 frame
+        output = await self._get_output(["-version"], timeout)
+        if output is None:
+            return None
 
+        result = re.search(r"ffmpeg version (\S*)", output)
+        if result is not None:
+            return result.group(1)
+        return None
+
+    async def _get_output(self, command: List[str], timeout: int) -> Optional[str]:
+        """Execute FFmpeg process and return the output."""
         is_open = await self.open(cmd=command, input_source=None, output="")
 
         # error after open?
         if not is_open:
             _LOGGER.warning("Error starting FFmpeg.")
-            return
+            return None
 
         # read output
         try:
             async with asyncio_timeout(timeout):
                 output, _ = await self._proc.communicate()
-
-            result = re.search(r"ffmpeg version (\S*)", output.decode())
-            if result is not None:
-                return result.group(1)
+            return output.decode(errors="replace")
 
         except (asyncio.TimeoutError, ValueError):
             _LOGGER.warning("Timeout reading stdout.")
@@ -90,3 +315,246 @@ class FFVersion(HAFFmpeg):
             await self.close(0)
 
         return None
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    """Features supported by a FFmpeg binary."""
+
+    version: Optional[str]
+    encoders: FrozenSet[str] = frozenset()
+    decoders: FrozenSet[str] = frozenset()
+    filters: FrozenSet[str] = frozenset()
+    command_filters: FrozenSet[str] = frozenset()
+    muxers: FrozenSet[str] = frozenset()
+    demuxers: FrozenSet[str] = frozenset()
+    input_protocols: FrozenSet[str] = frozenset()
+    output_protocols: FrozenSet[str] = frozenset()
+
+    def has_encoder(self, name: str) -> bool:
+        """Return True if the encoder is supported."""
+        return name in self.encoders
+
+    def has_decoder(self, name: str) -> bool:
+        """Return True if the decoder is supported."""
+        return name in self.decoders
+
+    def has_filter(self, name: str, commands: bool = False) -> bool:
+        """Return True if the filter is supported.
+
+        With commands, the filter need to support runtime commands too.
+        """
+        return name in (self.command_filters if commands else self.filters)
+
+    def has_muxer(self, name: str) -> bool:
+        """Return True if the output format is supported."""
+        return name in self.muxers
+
+    def has_demuxer(self, name: str) -> bool:
+        """Return True if the input format is supported."""
+        return name in self.demuxers
+
+    def has_protocol(self, name: str, output: bool = False) -> bool:
+        """Return True if the protocol is supported for input or output."""
+        return name in (self.output_protocols if output else self.input_protocols)
+
+    def as_dict(self) -> dict:
+        """Return a JSON serializable dict."""
+        return {
+            key: sorted(value) if isinstance(value, frozenset) else value
+            for key, value in asdict(self).items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Capabilities":
+        """Create capabilities from as_dict output."""
+        return cls(
+            **{
+                field.name: (
+                    data.get(field.name)
+                    if field.name == "version"
+                    else frozenset(data.get(field.name, ()))
+                )
+                for field in fields(cls)
+            }
+        )
+
+
+_CAPABILITIES: Dict[Tuple[str, int, int], Capabilities] = {}
+_CAPABILITIES_PENDING: Dict[Tuple[str, int, int], asyncio.Task] = {}
+
+
+def _binary_key(ffmpeg_bin: str) -> Optional[Tuple[str, int, int]]:
+    """Return path, mtime and size of a FFmpeg binary."""
+    path = shutil.which(ffmpeg_bin)
+    if path is None:
+        return None
+
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def _load_cache_file(cache_file: str, key: Tuple[str, int, int]) -> Optional[dict]:
+    """Read capabilities of a binary from cache file."""
+    try:
+        with open(cache_file, encoding="utf-8") as cache:
+            return json.load(cache).get("|".join(map(str, key)))
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cache_file(cache_file: str, key: Tuple[str, int, int], data: dict) -> None:
+    """Write capabilities of a binary to cache file."""
+    try:
+        with open(cache_file, encoding="utf-8") as cache:
+            content = json.load(cache)
+    except (OSError, ValueError):
+        content = {}
+
+    # drop entries of replaced binaries
+    content = {
+        name: value
+        for name, value in content.items()
+        if not name.startswith(f"{key[0]}|")
+    }
+    content["|".join(map(str, key))] = data
+
+    try:
+        with open(f"{cache_file}.tmp", "w", encoding="utf-8") as cache:
+            json.dump(content, cache)
+        os.replace(f"{cache_file}.tmp", cache_file)
+    except OSError as err:
+        _LOGGER.warning("Can't write FFmpeg capability cache: %s", err)
+
+
+def _parse_codecs(output: str) -> FrozenSet[str]:
+    """Parse output of -encoders or -decoders."""
+    _, _, table = output.partition("------")
+    return frozenset(
+        line.split()[1] for line in table.splitlines() if len(line.split()) > 1
+    )
+
+
+def _parse_filters(output: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Parse output of -filters and return all and command filters."""
+    names = set()
+    commands = set()
+    for match in re.finditer(
+        r"^ ?([A-Z.]{2,3}) +(\S+) +\S*->\S*", output, flags=re.MULTILINE
+    ):
+        names.add(match.group(2))
+        if "C" in match.group(1):
+            commands.add(match.group(2))
+    return frozenset(names), frozenset(commands)
+
+
+def _parse_formats(output: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Parse output of -formats and return muxers and demuxers."""
+    _, _, table = output.partition("--")
+    muxers = set()
+    demuxers = set()
+    for match in re.finditer(
+        r"^ ([D ])([E ])[d ]?\s+(\S+)", table, flags=re.MULTILINE
+    ):
+        names = match.group(3).split(",")
+        if match.group(1) == "D":
+            demuxers.update(names)
+        if match.group(2) == "E":
+            muxers.update(names)
+    return frozenset(muxers), frozenset(demuxers)
+
+
+def _parse_protocols(output: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Parse output of -protocols and return input and output protocols."""
+    protocols = {"Input:": set(), "Output:": set()}
+    current = None
+    for line in output.splitlines():
+        name = line.strip()
+        if name in protocols:
+            current = protocols[name]
+        elif name and current is not None and line.startswith(" "):
+            current.add(name)
+    return frozenset(protocols["Input:"]), frozenset(protocols["Output:"])
+
+
+class FFCapabilities(FFVersion):
+    """Retrieve and cache features supported by a FFmpeg binary.
+
+    The probe runs once per binary, keyed by path, mtime and size. Results
+    are kept in memory and optional in a JSON cache file.
+    """
+
+    async def get_capabilities(
+        self, cache_file: Optional[str] = None, timeout: int = 15
+    ) -> Optional[Capabilities]:
+        """Return capabilities of the FFmpeg binary."""
+        key = await self._loop.run_in_executor(None, _binary_key, self._ffmpeg)
+        if key is None:
+            _LOGGER.warning("Can't find FFmpeg binary %s", self._ffmpeg)
+            return None
+
+        capabilities = _CAPABILITIES.get(key)
+        if capabilities is not None:
+            return capabilities
+
+        # probe only once if many callers ask at the same time
+        task = _CAPABILITIES_PENDING.get(key)
+        if task is None:
+            task = self._loop.create_task(self._probe(key, cache_file, timeout))
+            _CAPABILITIES_PENDING[key] = task
+
+        return await asyncio.shield(task)
+
+    async def _probe(
+        self, key: Tuple[str, int, int], cache_file: Optional[str], timeout: int
+    ) -> Optional[Capabilities]:
+        """Probe capabilities once and keep them in memory."""
+        try:
+            capabilities = await self._load(key, cache_file, timeout)
+        finally:
+            del _CAPABILITIES_PENDING[key]
+
+        if capabilities is not None:
+            _CAPABILITIES[key] = capabilities
+        return capabilities
+
+    async def _load(
+        self, key: Tuple[str, int, int], cache_file: Optional[str], timeout: int
+    ) -> Optional[Capabilities]:
+        """Load capabilities from cache file or run FFmpeg."""
+        if cache_file is not None:
+            data = await self._loop.run_in_executor(
+                None, _load_cache_file, cache_file, key
+            )
+            if data is not None:
+                return Capabilities.from_dict(data)
+
+        version = await self.get_version(timeout)
+        output = {}
+        for option in ("-encoders", "-decoders", "-filters", "-formats", "-protocols"):
+            output[option] = await self._get_output(["-hide_banner", option], timeout)
+            if output[option] is None:
+                return None
+
+        filters, command_filters = _parse_filters(output["-filters"])
+        muxers, demuxers = _parse_formats(output["-formats"])
+        input_protocols, output_protocols = _parse_protocols(output["-protocols"])
+
+        capabilities = Capabilities(
+            version=version,
+            encoders=_parse_codecs(output["-encoders"]),
+            decoders=_parse_codecs(output["-decoders"]),
+            filters=filters,
+            command_filters=command_filters,
+            muxers=muxers,
+            demuxers=demuxers,
+            input_protocols=input_protocols,
+            output_protocols=output_protocols,
+        )
+
+        if cache_file is not None:
+            await self._loop.run_in_executor(
+                None, _save_cache_file, cache_file, key, capabilities.as_dict()
+            )
+        return capabilities
@@ -0,0 +1,160 @@
+"""Detect stalled FFmpeg instances and restart them."""
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from .core import HAFFmpeg
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class WatchdogStats:
+    """Stall statistics of a watched FFmpeg instance, times in seconds.
+
+    detect_time is the time without output until the last stall was
+    detected, recover_time the time from this detection until FFmpeg
+    output again.
+    """
+
+    stalls: int = 0
+    recoveries: int = 0
+    stalled: bool = False
+    detect_time: Optional[float] = None
+    recover_time: Optional[float] = None
+
+
+class _Watched:
+    """A FFmpeg instance with its restart coroutine."""
+
+    def __init__(
+        self, ffmpeg: HAFFmpeg, restart: Optional[Callable[[], Awaitable]]
+    ):
+        """Init watched instance."""
+        self.ffmpeg = ffmpeg
+        self.restart = restart
+        self.stats = WatchdogStats()
+        self.process: Optional["asyncio.subprocess.Process"] = None
+        self.since = 0.0
+        self.detected = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+
+class StallWatchdog:
+    """Restart FFmpeg instances they are running without output.
+
+    One sweep every interval seconds check all instances, there is no
+    timer per instance. A process without output for threshold seconds is
+    closed and started again with restart. Without restart it is only
+    closed, use it with FFmpegSupervisor they start it again.
+
+    Progress is enabled on watched instances without it, the progress
+    position advance also if the normal output is rare like framemd5.
+    It take effect with the next start, until then the normal output is
+    used and a process without recorded output is not checked.
+    """
+
+    def __init__(self, threshold: float = 30, interval: float = 5):
+        """Init watchdog."""
+        self._loop = asyncio.get_running_loop()
+        self._threshold = threshold
+        self._interval = interval
+        self._instances: Dict[str, _Watched] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def stats(self) -> Dict[str, WatchdogStats]:
+        """Return statistics of all instances."""
+        return {name: watched.stats for name, watched in self._instances.items()}
+
+    def watch(
+        self,
+        name: str,
+        ffmpeg: HAFFmpeg,
+        restart: Optional[Callable[[], Awaitable]] = None,
+    ) -> None:
+        """Watch a FFmpeg instance.
+
+        Restart is called after the stalled process is closed, like
+        lambda: sensor.open_sensor(input_source)
+        """
+        if name in self._instances:
+            raise ValueError(f"FFmpeg instance {name} is already watched")
+
+        if ffmpeg.progress is None:
+            ffmpeg.enable_progress()
+        self._instances[name] = _Watched(ffmpeg, restart)
+        if self._handle is None:
+            self._handle = self._loop.call_later(self._interval, self._sweep)
+
+    def unwatch(self, name: str) -> None:
+        """Stop watching a FFmpeg instance."""
+        watched = self._instances.pop(name, None)
+        if watched is not None and watched.task is not None:
+            watched.task.cancel()
+        if not self._instances and self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def close(self) -> None:
+        """Stop watching all instances."""
+        for name in list(self._instances):
+            self.unwatch(name)
+
+    def _sweep(self) -> None:
+        """Check all instances and schedule the next sweep."""
+        now = self._loop.time()
+        for name, watched in self._instances.items():
+            if watched.task is None:
+                self._check(name, watched, now)
+        self._handle = self._loop.call_later(self._interval, self._sweep)
+
+    def _check(self, name: str, watched: _Watched, now: float) -> None:
+        """Detect a stall or the recovery of a instance."""
+        ffmpeg = watched.ffmpeg
+        stats = watched.stats
+        last_output = ffmpeg.last_output
+
+        if stats.stalled and last_output is not None and last_output > watched.detected:
+            stats.stalled = False
+            stats.recoveries += 1
+            stats.recover_time = now - watched.detected
+            _LOGGER.info("FFmpeg %s recovered after %.1f seconds", name, stats.recover_time)
+
+        if not ffmpeg.is_running:
+            return
+
+        # without output and progress a quiet process can't be judged, like
+        # a process they was started before progress is enabled
+        if last_output is None and not ffmpeg.progress_started:
+            return
+
+        if ffmpeg.progress_started:
+            # a new process is quiet since it was seen first
+            if ffmpeg.process is not watched.process:
+                watched.process = ffmpeg.process
+                watched.since = now
+            quiet = now - max(watched.since, last_output or 0.0)
+        else:
+            quiet = now - last_output
+        if quiet < self._threshold:
+            return
+
+        stats.stalls += 1
+        stats.stalled = True
+        stats.detect_time = quiet
+        watched.detected = now
+        _LOGGER.warning("FFmpeg %s has no output for %.1f seconds", name, quiet)
+        watched.task = self._loop.create_task(self._restart(name, watched))
+
+    async def _restart(self, name: str, watched: _Watched) -> None:
+        """Close a stalled instance and start it again."""
+        try:
+            await watched.ffmpeg.close()
+            if watched.restart is not None:
+                await watched.restart()
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error restarting FFmpeg %s", name)
+        finally:
+            watched.task = None
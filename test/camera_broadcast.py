@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.camera import MjpegBroadcaster
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Input file for ffmpeg")
+@click.option("--clients", "-c", default=3, type=int, help="Number of viewers")
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+def cli(ffmpeg, source, clients, extra):
+    """FFMPEG shared mjpeg stream."""
+
+    async def read_stream():
+        """Read stream with multiple clients inside loop."""
+        broadcaster = MjpegBroadcaster(ffmpeg_bin=ffmpeg)
+
+        async def client(num):
+            subscriber = await broadcaster.subscribe(source, extra)
+            async with subscriber:
+                async for frame in subscriber:
+                    print("Client %d: frame %d bytes" % (num, len(frame)))
+                    await asyncio.sleep(num * 0.1)
+
+        try:
+            await asyncio.gather(*(client(num) for num in range(clients)))
+        finally:
+            await broadcaster.close()
+
+    asyncio.run(read_stream())
+
+
+if __name__ == "__main__":
+    cli()
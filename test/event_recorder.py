@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.recorder import EventRecorder
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Input file for ffmpeg")
+@click.option("--output", "-o", default="clip.mp4", help="Clip file")
+@click.option("--before", "-b", default=10, type=float, help="Seconds before event")
+@click.option("--after", "-a", default=5, type=float, help="Seconds after event")
+@click.option("--wait", "-w", default=15, type=float, help="Seconds until event")
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+def cli(ffmpeg, source, output, before, after, wait, extra):
+    """FFMPEG event clip from a in-memory buffer."""
+
+    async def run():
+        recorder = EventRecorder(ffmpeg_bin=ffmpeg, pre_time=before)
+        await recorder.open_recorder(input_source=source, extra_cmd=extra)
+        try:
+            await asyncio.sleep(wait)
+            print(
+                "Event, buffer %d bytes, %.1f seconds"
+                % (recorder.buffered_bytes, recorder.buffered_time)
+            )
+            await recorder.save_clip(output, before, after)
+        finally:
+            await recorder.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.analysis import NoiseThreshold, SensorAudioLevel
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Input file for ffmpeg")
+@click.option(
+    "--peak",
+    "-p",
+    multiple=True,
+    type=int,
+    help="dBFS thresholds for noise detection. Default -30",
+)
+@click.option("--levels", "-l", is_flag=True, help="Print every level")
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+def cli(ffmpeg, source, peak, levels, extra):
+    """FFMPEG audio level meter."""
+
+    def callback(name, state):
+        print("Noise %s is: %s" % (name, str(state)))
+
+    def level_callback(rms, peak):
+        print("Level RMS %.1f dBFS, peak %.1f dBFS" % (rms, peak))
+
+    async def run():
+        sensor = SensorAudioLevel(
+            ffmpeg_bin=ffmpeg,
+            callback=callback,
+            level_callback=level_callback if levels else None,
+        )
+        sensor.set_options(
+            thresholds=[NoiseThreshold(f"{value}dB", value) for value in peak]
+        )
+        await sensor.open_sensor(input_source=source, extra_cmd=extra)
+        try:
+            while True:
+                await asyncio.sleep(0.1)
+        finally:
+            await sensor.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    cli()
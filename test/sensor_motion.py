@@ -3,10 +3,21 @@ import logging
 
 import click
 
-from haffmpeg.sensor import SensorMotion
+from haffmpeg.sensor import (
+    MOTION_DECODE_FULL,
+    MOTION_DECODE_KEYFRAMES,
+    MOTION_DECODE_LOW_CPU,
+    SensorMotion,
+)
 
 logging.basicConfig(level=logging.DEBUG)
 
+DECODE = {
+    "full": MOTION_DECODE_FULL,
+    "low_cpu": MOTION_DECODE_LOW_CPU,
+    "keyframes": MOTION_DECODE_KEYFRAMES,
+}
+
 
 @click.command()
 @click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
@@ -39,8 +50,20 @@ logging.basicConfig(level=logging.DEBUG)
     type=float,
     help="Scene change settings or percent of image they need change",
 )
+@click.option(
+    "--decode",
+    "-d",
+    default="full",
+    type=click.Choice(list(DECODE)),
+    help="Decode mode, low_cpu and keyframes reduce CPU usage",
+)
+@click.option(
+    "--scene-scores", is_flag=True, help="Read scene scores instead of framemd5"
+)
 @click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
-def cli(ffmpeg, source, reset, repeat_time, repeat, changes, extra):
+def cli(
+    ffmpeg, source, reset, repeat_time, repeat, changes, decode, scene_scores, extra
+):
     """FFMPEG noise detection."""
 
     def callback(state):
@@ -50,7 +73,12 @@ def cli(ffmpeg, source, reset, repeat_time, repeat, changes, extra):
 
         sensor = SensorMotion(ffmpeg_bin=ffmpeg, callback=callback)
         sensor.set_options(
-            time_reset=reset, changes=changes, repeat=repeat, time_repeat=repeat_time
+            time_reset=reset,
+            changes=changes,
+            repeat=repeat,
+            time_repeat=repeat_time,
+            decode=DECODE[decode],
+            scene_scores=scene_scores,
         )
         await sensor.open_sensor(input_source=source, extra_cmd=extra)
         try:
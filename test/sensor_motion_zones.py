@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.analysis import MotionZone, SensorMotionZones
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def parse_area(value):
+    """Parse x,y,width,height relative to the image."""
+    return tuple(float(part) for part in value.split(","))
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Input file for ffmpeg")
+@click.option(
+    "--zone",
+    "-z",
+    multiple=True,
+    help="Zone as name=x,y,width,height relative to the image",
+)
+@click.option(
+    "--ignore", "-i", multiple=True, help="Ignored area as x,y,width,height"
+)
+@click.option(
+    "--changes",
+    "-c",
+    default=2,
+    type=float,
+    help="Percent of changed pixels in a zone they trigger motion",
+)
+@click.option(
+    "--reset",
+    "-r",
+    default=60,
+    type=int,
+    help="Time duration to need no motion before reset state",
+)
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+def cli(ffmpeg, source, zone, ignore, changes, reset, extra):
+    """FFMPEG motion detection per zone."""
+
+    def callback(name, state):
+        print("Motion in zone %s is: %s" % (name, str(state)))
+
+    async def run():
+        zones = []
+        for value in zone:
+            name, _, area = value.partition("=")
+            zones.append(MotionZone(name, parse_area(area), changes=changes))
+
+        sensor = SensorMotionZones(ffmpeg_bin=ffmpeg, callback=callback)
+        sensor.set_options(
+            zones=zones,
+            ignore=[parse_area(area) for area in ignore],
+            time_reset=reset,
+        )
+        await sensor.open_sensor(input_source=source, extra_cmd=extra)
+        try:
+            while True:
+                await asyncio.sleep(0.1)
+        finally:
+            await sensor.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    cli()
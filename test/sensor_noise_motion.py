@@ -0,0 +1,54 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.sensor import SensorNoiseMotion
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Input file for ffmpeg")
+@click.option(
+    "--peak", "-p", default=-30, type=int, help="dB for detect a peak. Default -30"
+)
+@click.option(
+    "--changes",
+    "-c",
+    default=10,
+    type=float,
+    help="Scene change settings or percent of image they need change",
+)
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+def cli(ffmpeg, source, peak, changes, extra):
+    """FFMPEG noise and motion detection."""
+
+    def noise_callback(state):
+        print("Noise detection is: %s" % str(state))
+
+    def motion_callback(state):
+        print("Motion detection is: %s" % str(state))
+
+    async def run():
+
+        sensor = SensorNoiseMotion(
+            ffmpeg_bin=ffmpeg,
+            noise_callback=noise_callback,
+            motion_callback=motion_callback,
+        )
+        sensor.noise.set_options(peak=peak)
+        sensor.motion.set_options(changes=changes)
+        await sensor.open_sensor(input_source=source, extra_cmd=extra)
+        try:
+            while True:
+                await asyncio.sleep(0.1)
+        finally:
+            await sensor.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.hub import StreamHub
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--source", "-s", help="Input file for ffmpeg")
+@click.option("--interval", "-i", default=5, type=float, help="Snapshot interval")
+@click.option("--changes", "-c", default=10, type=float, help="Scene changes")
+@click.option("--extra", "-e", help="Extra ffmpeg command line arguments")
+@click.option("--output", "-o", help="Write the newest snapshot to this file")
+def cli(ffmpeg, source, interval, changes, extra, output):
+    """FFMPEG live stream, snapshots and motion from one decode."""
+
+    def callback(state):
+        print("Motion detection is: %s" % str(state))
+
+    async def run():
+        hub = StreamHub(ffmpeg_bin=ffmpeg, callback=callback)
+        hub.set_options(snapshot_interval=interval, changes=changes)
+        await hub.open_hub(input_source=source, extra_cmd=extra)
+
+        try:
+            async with hub.subscribe() as subscriber:
+                async for frame in subscriber:
+                    print(
+                        "Live frame %d bytes, score %s" % (len(frame), hub.scene_score)
+                    )
+                    if output is not None and hub.image is not None:
+                        with open(output, "wb") as fh:
+                            fh.write(hub.image)
+        finally:
+            await hub.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    cli()
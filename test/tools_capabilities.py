@@ -0,0 +1,30 @@
+import asyncio
+import logging
+
+import click
+
+from haffmpeg.tools import FFCapabilities
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+@click.command()
+@click.option("--ffmpeg", "-f", default="ffmpeg", help="FFmpeg binary")
+@click.option("--cache", "-c", default=None, help="Capability cache file")
+def cli(ffmpeg, cache):
+    """FFMPEG capabilities."""
+
+    async def get_capabilities():
+        ffcapabilities = FFCapabilities(ffmpeg_bin=ffmpeg)
+        capabilities = await ffcapabilities.get_capabilities(cache_file=cache)
+        if capabilities is None:
+            print("Can't read FFmpeg capabilities")
+            return
+        for key, value in capabilities.as_dict().items():
+            print("%s: %s" % (key, value))
+
+    asyncio.run(get_capabilities())
+
+
+if __name__ == "__main__":
+    cli()